@@ -0,0 +1,204 @@
+"""
+Download Scheduler
+Decides which queued download starts next: global bandwidth cap (token bucket),
+per-host connection limit, queue ordering policy and adaptive concurrency
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# ----- Config -----
+BANDWIDTH_LIMIT = None  # bytes per second for all downloads together; None = unlimited
+PER_HOST_LIMIT = 12  # simultaneous connections (and downloads) per host
+QUEUE_POLICY = "fifo"  # "fifo" or "shortest-first" (by estimated size)
+ADAPTIVE_CONCURRENCY = True
+ADAPT_WINDOW = 5.0  # seconds of throughput measurement per concurrency decision
+ERROR_RATE_LIMIT = 0.2  # failed fraction of downloads and requests per window that triggers a back-off
+CANCEL_POLL_INTERVAL = 0.1  # seconds between cancellation checks while waiting for bandwidth or a connection
+
+QUEUE_POLICIES = ("fifo", "shortest-first")
+
+
+def parse_rate(text):
+    """Parse a rate like '800K', '5M' or '1.5G' (bytes per second)"""
+    if text is None:
+        return None
+    text = str(text).strip().upper().rstrip('/S').rstrip('B').rstrip('I')
+    factors = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if text and text[-1] in factors:
+        return int(float(text[:-1]) * factors[text[-1]])
+    return int(float(text))
+
+
+def source_host(source):
+    return urlsplit(source['url']).netloc.lower()
+
+
+class TokenBucket:
+    """Thread-safe token bucket; consume() blocks until the bytes may be transferred"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount, cancelled=None):
+        """Wait until amount bytes are paid for; returns early (unpaid) once cancelled() is true"""
+        while amount > 0:
+            if cancelled and cancelled():
+                return
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                # Large reads are paid for in pieces so one request cannot starve the others
+                take = min(amount, self.capacity)
+                if self.tokens >= take:
+                    self.tokens -= take
+                    amount -= take
+                    continue
+                wait = (take - self.tokens) / self.rate
+            time.sleep(min(wait, CANCEL_POLL_INTERVAL) if cancelled else wait)
+
+
+class DownloadScheduler:
+    """Admission control for download jobs plus connection/bandwidth limits for the native engine"""
+
+    def __init__(self, max_concurrency, bandwidth_limit=BANDWIDTH_LIMIT, per_host_limit=PER_HOST_LIMIT,
+                 policy=QUEUE_POLICY, adaptive=ADAPTIVE_CONCURRENCY):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self.policy = policy if policy in QUEUE_POLICIES else "fifo"
+        self.adaptive = adaptive
+        self.bandwidth_limit = bandwidth_limit
+        self.bucket = TokenBucket(bandwidth_limit) if bandwidth_limit else None
+
+        # Adaptive mode starts low and adds downloads while aggregate throughput keeps improving
+        self.limit = min(2, self.max_concurrency) if adaptive else self.max_concurrency
+        self.active_jobs = 0
+        self.jobs_per_host = {}
+        self.connections = {}
+        self.condition = threading.Condition()
+
+        self.window_start = time.monotonic()
+        self.window_bytes_start = 0
+        self.window_finished = 0
+        self.window_failed = 0
+        self.best_throughput = 0.0
+
+    # ---- Queue ordering ----
+    def order(self, sources, estimate_size=None):
+        """Return the sources in the order they should be started"""
+        if self.policy != "shortest-first" or not estimate_size:
+            return list(sources)
+        sources = list(sources)
+        if len(sources) < 2:
+            return sources
+        with ThreadPoolExecutor(max_workers=min(4, len(sources))) as pool:
+            sizes = list(pool.map(estimate_size, sources))
+        # Unknown sizes go last, in their original order
+        ranked = sorted(range(len(sources)), key=lambda i: (sizes[i] is None, sizes[i] or 0))
+        return [sources[i] for i in ranked]
+
+    # ---- Job admission ----
+    def can_start(self, source):
+        with self.condition:
+            host = source_host(source)
+            return (self.active_jobs < self.limit and
+                    self.jobs_per_host.get(host, 0) < self.per_host_limit)
+
+    def job_started(self, source):
+        with self.condition:
+            host = source_host(source)
+            self.active_jobs += 1
+            self.jobs_per_host[host] = self.jobs_per_host.get(host, 0) + 1
+
+    def job_finished(self, source, success):
+        with self.condition:
+            host = source_host(source)
+            self.active_jobs = max(0, self.active_jobs - 1)
+            self.jobs_per_host[host] = max(0, self.jobs_per_host.get(host, 0) - 1)
+            self.window_finished += 1
+            if not success:
+                self.window_failed += 1
+            self.condition.notify_all()
+
+    def record_request(self, success):
+        """Native engine requests (including retried segments) count towards the error rate"""
+        with self.condition:
+            self.window_finished += 1
+            if not success:
+                self.window_failed += 1
+
+    def ytdlp_rate_limit(self):
+        """Per-process --limit-rate share of the global cap for yt-dlp downloads"""
+        if not self.bandwidth_limit:
+            return None
+        return max(1, int(self.bandwidth_limit / max(1, self.limit)))
+
+    # ---- Adaptive concurrency ----
+    def sample(self, total_bytes):
+        """Called regularly with the bytes downloaded so far; adjusts the concurrency limit"""
+        if not self.adaptive:
+            return
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        if elapsed < ADAPT_WINDOW:
+            return
+
+        throughput = (total_bytes - self.window_bytes_start) / elapsed
+        with self.condition:
+            finished, failed = self.window_finished, self.window_failed
+            old_limit = self.limit
+
+            if finished and failed / finished > ERROR_RATE_LIMIT:
+                # Errors rising: back off hard, the CDN may be throttling us
+                self.limit = max(1, self.limit // 2)
+                self.best_throughput = 0.0
+            elif self.active_jobs >= self.limit and throughput > self.best_throughput * 1.05:
+                # Still improving with every slot in use: try one more download
+                self.best_throughput = throughput
+                self.limit = min(self.max_concurrency, self.limit + 1)
+            elif self.active_jobs >= self.limit and throughput < self.best_throughput * 0.8 and self.limit > 1:
+                # More downloads made things slower: step back
+                self.limit -= 1
+
+            if self.limit != old_limit:
+                print(f"[scheduler] concurrency {old_limit} -> {self.limit} "
+                      f"({throughput / (1024 * 1024):.2f} MiB/s, {failed}/{finished} failed)")
+
+            self.window_start = now
+            self.window_bytes_start = total_bytes
+            self.window_finished = 0
+            self.window_failed = 0
+
+    # ---- Connection-level limits (native engine) ----
+    @contextmanager
+    def connection(self, host, cancelled=None):
+        """
+        Hold one of the per-host connection slots for the duration of a request.
+        Stops waiting for a slot once cancelled() is true; the caller then gives up right away.
+        """
+        host = host.lower()
+        with self.condition:
+            while self.connections.get(host, 0) >= self.per_host_limit:
+                if cancelled and cancelled():
+                    break
+                self.condition.wait(CANCEL_POLL_INTERVAL if cancelled else None)
+            self.connections[host] = self.connections.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.connections[host] -= 1
+                self.condition.notify_all()
+
+    def throttle(self, amount, cancelled=None):
+        """Pay for transferred bytes against the global bandwidth cap"""
+        if self.bucket:
+            self.bucket.consume(amount, cancelled)
@@ -0,0 +1,714 @@
+"""
+Native HLS Fetcher
+Downloads HLS streams without yt-dlp: parses the playlist and fetches the
+segments concurrently over pooled keep-alive connections (standard library only)
+"""
+
+import asyncio
+import contextlib
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from collections import deque
+from urllib.parse import urljoin, urlsplit
+
+# ----- Config -----
+SEGMENT_CONCURRENCY = 8  # segments fetched at the same time per video
+REQUEST_TIMEOUT = 30  # seconds per HTTP request
+MAX_REDIRECTS = 5
+READ_CHUNK_SIZE = 64 * 1024  # bytes per read when a bandwidth cap is active
+ESTIMATE_BANDWIDTH = 1500000  # bits/s assumed for size estimates of playlists without BANDWIDTH
+SEGMENT_RETRIES = 5  # extra attempts per request on timeouts, connection errors and 408/429/5xx
+RETRY_BASE_DELAY = 0.5  # seconds; backoff is random between 0 and base * 2^attempt (full jitter)
+RETRY_MAX_DELAY = 15.0
+HEDGE_PERCENTILE = 0.95  # segments slower than this latency percentile get a duplicate request; None = off
+HEDGE_MIN_SAMPLES = 10  # segment latencies needed before hedging starts
+HEDGE_MIN_DELAY = 1.0  # never hedge a segment sooner than this (seconds)
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+class HLSError(Exception):
+    """Raised when a playlist or segment cannot be downloaded"""
+
+
+class HLSHTTPError(HLSError):
+    """Raised for an unexpected HTTP status"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class HLSUnsupportedError(HLSError):
+    """Raised for streams the native fetcher cannot handle (e.g. encrypted)"""
+
+
+class HLSStopped(HLSError):
+    """Raised when the download was stopped by the user"""
+
+
+# ------ Playlist parsing ------
+def parse_attribute_list(text):
+    """Parse an HLS attribute list: KEY=VALUE,KEY="quoted, value",..."""
+    attrs = {}
+    key = ''
+    value = ''
+    in_key = True
+    in_quotes = False
+    for ch in text:
+        if in_key:
+            if ch == '=':
+                in_key = False
+            elif ch != ',':
+                key += ch
+        elif ch == '"':
+            in_quotes = not in_quotes
+        elif ch == ',' and not in_quotes:
+            attrs[key.strip().upper()] = value.strip()
+            key, value, in_key = '', '', True
+        else:
+            value += ch
+    if key.strip():
+        attrs[key.strip().upper()] = value.strip()
+    return attrs
+
+
+def parse_playlist(text, base_url):
+    """
+    Parse an m3u8 playlist.
+    Returns {'type': 'master', 'variants': [...], 'audio': [...]} or
+    {'type': 'media', 'segments': [...], 'init': {...} | None, 'encrypted': bool}
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith('#EXTM3U'):
+        raise HLSError("Not an HLS playlist")
+
+    variants = []
+    audio = []
+    segments = []
+    init = None
+    encrypted = False
+    pending_variant = None
+    duration = 0.0
+    byte_range = None
+    next_offset = 0
+
+    for line in lines[1:]:
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attrs = parse_attribute_list(line.split(':', 1)[1])
+            pending_variant = {
+                'bandwidth': int(attrs.get('BANDWIDTH', '0') or 0),
+                'resolution': attrs.get('RESOLUTION', ''),
+                'codecs': attrs.get('CODECS', ''),
+                'audio_group': attrs.get('AUDIO', '')
+            }
+        elif line.startswith('#EXT-X-MEDIA:'):
+            attrs = parse_attribute_list(line.split(':', 1)[1])
+            if attrs.get('TYPE', '').upper() == 'AUDIO':
+                audio.append({
+                    'group_id': attrs.get('GROUP-ID', ''),
+                    'name': attrs.get('NAME', ''),
+                    'language': attrs.get('LANGUAGE', ''),
+                    'default': attrs.get('DEFAULT', 'NO').upper() == 'YES',
+                    'url': urljoin(base_url, attrs['URI']) if attrs.get('URI') else None
+                })
+        elif line.startswith('#EXTINF:'):
+            try:
+                duration = float(line.split(':', 1)[1].split(',')[0])
+            except ValueError:
+                duration = 0.0
+        elif line.startswith('#EXT-X-BYTERANGE:'):
+            spec = line.split(':', 1)[1]
+            length, _, offset = spec.partition('@')
+            start = int(offset) if offset else next_offset
+            byte_range = (start, int(length))
+            next_offset = start + int(length)
+        elif line.startswith('#EXT-X-MAP:'):
+            attrs = parse_attribute_list(line.split(':', 1)[1])
+            init = {'url': urljoin(base_url, attrs.get('URI', '')), 'range': None}
+            if attrs.get('BYTERANGE'):
+                length, _, offset = attrs['BYTERANGE'].partition('@')
+                init['range'] = (int(offset or 0), int(length))
+        elif line.startswith('#EXT-X-KEY:'):
+            attrs = parse_attribute_list(line.split(':', 1)[1])
+            if attrs.get('METHOD', 'NONE').upper() != 'NONE':
+                encrypted = True
+        elif line.startswith('#'):
+            continue
+        elif pending_variant is not None:
+            pending_variant['url'] = urljoin(base_url, line)
+            variants.append(pending_variant)
+            pending_variant = None
+        else:
+            segments.append({
+                'index': len(segments),
+                'url': urljoin(base_url, line),
+                'duration': duration,
+                'range': byte_range
+            })
+            duration = 0.0
+            byte_range = None
+
+    if variants or audio:
+        return {'type': 'master', 'variants': variants, 'audio': audio}
+    return {'type': 'media', 'segments': segments, 'init': init, 'encrypted': encrypted}
+
+
+def select_media_playlist(master, audio_only=False, check_audio=True):
+    """
+    Pick the media playlist to download from a master playlist.
+    Video: highest bandwidth. Audio-only: the (default) audio rendition, else the lowest-bitrate variant.
+    A video variant whose audio is a separate rendition would be saved without sound, so it raises
+    HLSUnsupportedError (yt-dlp merges the two) unless check_audio is False.
+    """
+    if audio_only:
+        renditions = [r for r in master['audio'] if r['url']]
+        if renditions:
+            preferred = [r for r in renditions if r['default']] or renditions
+            return preferred[0]['url']
+        if master['variants']:
+            return min(master['variants'], key=lambda v: v['bandwidth'])['url']
+    if not master['variants']:
+        raise HLSError("Master playlist has no variants")
+    variant = max(master['variants'], key=lambda v: v['bandwidth'])
+    if check_audio and variant['audio_group'] and any(
+            r['url'] and r['group_id'] == variant['audio_group'] for r in master['audio']):
+        raise HLSUnsupportedError("Video variant has a separate audio rendition")
+    return variant['url']
+
+
+def describe_master(master):
+    """Short label for the panel, e.g. '3 variants, 360p-1080p, audio-only'"""
+    parts = []
+    variants = master['variants']
+    if variants:
+        parts.append(f"{len(variants)} variant{'s' if len(variants) != 1 else ''}")
+        heights = sorted({int(v['resolution'].split('x')[1]) for v in variants
+                          if 'x' in v['resolution'] and v['resolution'].split('x')[1].isdigit()})
+        if heights:
+            parts.append(f"{heights[0]}p" if len(heights) == 1 else f"{heights[0]}p-{heights[-1]}p")
+    if any(r['url'] for r in master['audio']):
+        parts.append("audio-only")
+    return ", ".join(parts)
+
+
+# ------ Resume checkpoints ------
+def checkpoint_path(part_path):
+    """The checkpoint lives next to the partial download"""
+    return part_path[:-len('.part')] + '.resume.json' if part_path.endswith('.part') else part_path + '.resume.json'
+
+
+def playlist_fingerprint(playlist):
+    """Identify a media playlist independent of the (expiring) tokens in its URLs"""
+    first = urlsplit(playlist['segments'][0]['url'])
+    last = urlsplit(playlist['segments'][-1]['url'])
+    return f"{len(playlist['segments'])}:{first.path}:{last.path}"
+
+
+def load_checkpoint(part_path, fingerprint):
+    """Return (next_index, byte_offset) to resume from, or (0, 0) to start over"""
+    path = checkpoint_path(part_path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('fingerprint') != fingerprint:
+            return 0, 0
+        offset = int(checkpoint['bytes'])
+        if os.path.getsize(part_path) < offset:
+            return 0, 0
+        return int(checkpoint['next_index']), offset
+    except (OSError, ValueError, KeyError):
+        return 0, 0
+
+
+def save_checkpoint(part_path, fingerprint, next_index, byte_offset):
+    """Atomically record how far the partial download got"""
+    path = checkpoint_path(part_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'next_index': next_index, 'bytes': byte_offset}, f)
+    os.replace(tmp_path, path)
+
+
+def remove_checkpoint(part_path):
+    try:
+        os.remove(checkpoint_path(part_path))
+    except OSError:
+        pass
+
+
+# ------ Retries ------
+def is_retryable(error):
+    """Transient network errors and throttling/server statuses are worth another attempt"""
+    if isinstance(error, HLSHTTPError):
+        return error.status in RETRY_STATUSES
+    if isinstance(error, HLSError):
+        return False
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, maximum=RETRY_MAX_DELAY):
+    """Exponential backoff with full jitter, so parallel workers do not retry in lockstep"""
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+# ------ Keep-alive connection pool ------
+class ConnectionPool:
+    """
+    Reusable HTTP(S) connections per host, safe to use from worker threads.
+    An optional limiter (see download_scheduler.DownloadScheduler) caps connections
+    per host with connection(netloc, cancelled), bandwidth with throttle(nbytes, cancelled)
+    and is told about failed requests with record_request(success).
+    """
+
+    def __init__(self, timeout=REQUEST_TIMEOUT, limiter=None):
+        self.timeout = timeout
+        self.limiter = limiter
+        self.idle = {}
+        # Sockets of requests in progress -> their cancel event
+        self.busy = {}
+        self.closed = threading.Event()
+        self.lock = threading.Lock()
+
+    def acquire(self, scheme, netloc):
+        with self.lock:
+            conns = self.idle.get((scheme, netloc))
+            if conns:
+                return conns.pop()
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def release(self, scheme, netloc, conn):
+        with self.lock:
+            self.idle.setdefault((scheme, netloc), []).append(conn)
+
+    def close(self):
+        """Close idle connections and abort requests still running in other threads"""
+        self.closed.set()
+        with self.lock:
+            for conns in self.idle.values():
+                for conn in conns:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self.idle.clear()
+            busy = list(self.busy)
+        for sock in busy:
+            self.interrupt(sock)
+
+    def cancel_request(self, cancel):
+        """Abort the get() that was given this cancel event, even in the middle of a read"""
+        cancel.set()
+        with self.lock:
+            busy = [sock for sock, owner in self.busy.items() if owner is cancel]
+        for sock in busy:
+            self.interrupt(sock)
+
+    def interrupt(self, sock):
+        # Shutting the socket down wakes a read blocked in another thread; closing it would not
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def is_cancelled(self, cancel):
+        return cancel.is_set() or self.closed.is_set()
+
+    def get(self, url, headers, byte_range=None, cancel=None):
+        """
+        Blocking GET that follows redirects and returns the body as bytes.
+        cancel_request(cancel) from another thread makes it raise HLSStopped promptly.
+        """
+        cancel = cancel or threading.Event()
+        request_headers = dict(headers)
+        if byte_range:
+            start, length = byte_range
+            request_headers['Range'] = f"bytes={start}-{start + length - 1}"
+
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+
+            if self.limiter:
+                with self.limiter.connection(parts.netloc, lambda: self.is_cancelled(cancel)):
+                    conn, response, body = self.request(parts, path, request_headers, cancel)
+            else:
+                conn, response, body = self.request(parts, path, request_headers, cancel)
+
+            if response.will_close:
+                conn.close()
+            else:
+                self.release(parts.scheme, parts.netloc, conn)
+
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.getheader('Location')
+                if not location:
+                    raise HLSError(f"Redirect without location for {url}")
+                url = urljoin(url, location)
+                continue
+            if response.status not in (200, 206):
+                raise HLSHTTPError(f"HTTP {response.status} for {url}", response.status)
+            return body
+
+        raise HLSError(f"Too many redirects for {url}")
+
+    def request(self, parts, path, headers, cancel):
+        """Send one GET; a pooled connection may have been closed by the server, so retry once on a fresh one"""
+        for attempt in range(2):
+            sock = None
+            conn = self.acquire(parts.scheme, parts.netloc)
+            try:
+                # The socket itself is tracked: the connection lets go of it when the response closes it
+                if conn.sock is None:
+                    conn.connect()
+                sock = conn.sock
+                # Registered before the cancel check, so a concurrent cancel_request() always sees one or the other
+                with self.lock:
+                    self.busy[sock] = cancel
+                if self.is_cancelled(cancel):
+                    raise HLSStopped("Request cancelled")
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = self.read_body(response, cancel)
+                # An interrupted read can end early without an error
+                if self.is_cancelled(cancel):
+                    raise HLSStopped("Request cancelled")
+                return conn, response, body
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                    http.client.CannotSendRequest, http.client.BadStatusLine):
+                conn.close()
+                if attempt == 1 or self.is_cancelled(cancel):
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            finally:
+                with self.lock:
+                    self.busy.pop(sock, None)
+
+    def read_body(self, response, cancel):
+        if not self.limiter:
+            return response.read()
+        # Read in chunks so the bandwidth cap paces the transfer instead of the whole segment at once
+        chunks = []
+        while not self.is_cancelled(cancel):
+            chunk = response.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return b''.join(chunks)
+            self.limiter.throttle(len(chunk), lambda: self.is_cancelled(cancel))
+            chunks.append(chunk)
+        raise HLSStopped("Request cancelled")
+
+
+# ------ Downloader ------
+class HLSFetcher:
+    """Fetch an HLS stream segment-parallel and write the segments in order"""
+
+    def __init__(self, headers=None, concurrency=SEGMENT_CONCURRENCY,
+                 progress_callback=None, stop_check=None, resume=False, audio_only=False, limiter=None,
+                 retries=SEGMENT_RETRIES, hedge_percentile=HEDGE_PERCENTILE, stats=None, segment_sink=None):
+        self.headers = headers or {}
+        self.concurrency = max(1, int(concurrency))
+        self.progress_callback = progress_callback
+        self.stop_check = stop_check
+        self.resume = resume
+        self.audio_only = audio_only
+        self.limiter = limiter
+        self.retries = max(0, int(retries))
+        self.hedge_percentile = hedge_percentile
+        self.pool = ConnectionPool(limiter=limiter)
+        # Called with the init section and every segment in playlist order (e.g. an ffmpeg decode pipe)
+        self.segment_sink = segment_sink
+        # Recent segment latencies (seconds) for the hedging threshold
+        self.latencies = deque(maxlen=200)
+        # Failure accounting for this source; the caller may pass its own dict to read it live
+        self.stats = stats if stats is not None else {}
+        for key in ('retries', 'hedged', 'hedge_wins'):
+            self.stats.setdefault(key, 0)
+
+    async def fetch(self, url, byte_range=None):
+        """GET with retries: transient errors are retried with jittered exponential backoff"""
+        for attempt in range(self.retries + 1):
+            if self.stop_check and self.stop_check():
+                raise HLSStopped("Download stopped by user")
+            cancel = threading.Event()
+            try:
+                data = await asyncio.to_thread(self.pool.get, url, self.headers, byte_range, cancel)
+            except asyncio.CancelledError:
+                # Cancelling the task does not stop the worker thread (a losing hedge, a stopped
+                # download): abort its request so asyncio.run() does not wait for the read
+                self.pool.cancel_request(cancel)
+                raise
+            except Exception as e:
+                self.record_request(False)
+                if attempt == self.retries or not is_retryable(e):
+                    raise
+                self.stats['retries'] += 1
+                self.stats['last_error'] = str(e)
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            self.record_request(True)
+            return data
+
+    def record_request(self, success):
+        if self.limiter and hasattr(self.limiter, 'record_request'):
+            self.limiter.record_request(success)
+
+    def hedge_threshold(self):
+        """Latency after which a segment request gets a duplicate, or None while there is too little data"""
+        if self.hedge_percentile is None or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile))
+        return max(HEDGE_MIN_DELAY, ordered[index])
+
+    async def fetch_segment_data(self, segment):
+        """Fetch a segment; when it is slower than the hedge threshold, race a duplicate request"""
+        start = time.monotonic()
+        threshold = self.hedge_threshold()
+        tasks = [asyncio.create_task(self.fetch(segment['url'], segment['range']))]
+        try:
+            if threshold is not None:
+                done, _ = await asyncio.wait(tasks, timeout=threshold)
+                if not done:
+                    # The duplicate goes out on another pooled connection, often to a different edge
+                    self.stats['hedged'] += 1
+                    tasks.append(asyncio.create_task(self.fetch(segment['url'], segment['range'])))
+            data, winner = await self.first_success(tasks)
+            if winner is not tasks[0]:
+                self.stats['hedge_wins'] += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+        self.latencies.append(time.monotonic() - start)
+        return data
+
+    async def first_success(self, tasks):
+        """Result of the first task that succeeds; the first error if all of them fail"""
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), task
+                error = error or task.exception()
+        raise error
+
+    async def load_media_playlist(self, url):
+        """Load the playlist; for a master playlist pick the variant (or audio rendition) to download"""
+        text = (await self.fetch(url)).decode('utf-8', errors='ignore')
+        playlist = parse_playlist(text, url)
+        if playlist['type'] == 'master':
+            media_url = select_media_playlist(playlist, self.audio_only)
+            text = (await self.fetch(media_url)).decode('utf-8', errors='ignore')
+            playlist = parse_playlist(text, media_url)
+            if playlist['type'] != 'media':
+                raise HLSError("Variant playlist is not a media playlist")
+        return playlist
+
+    async def download(self, playlist_url, output_base):
+        """
+        Download the stream to output_base + .ts/.mp4 and return the final path.
+        With output_base None nothing is written to disk; the segments only go to segment_sink.
+        """
+        playlist = await self.load_media_playlist(playlist_url)
+        if playlist['encrypted']:
+            raise HLSUnsupportedError("Encrypted HLS streams are not supported by the native fetcher")
+        segments = playlist['segments']
+        if not segments:
+            raise HLSError("Playlist contains no segments")
+
+        if playlist['init']:
+            ext = '.mp4'
+        elif urlsplit(segments[0]['url']).path.lower().endswith('.aac'):
+            ext = '.aac'  # packed audio rendition
+        else:
+            ext = '.ts'
+        part_path = output_base + ext + '.part' if output_base else None
+        if part_path:
+            os.makedirs(os.path.dirname(part_path) or '.', exist_ok=True)
+
+        # Continue a previous partial download of the same stream if there is a checkpoint
+        fingerprint = playlist_fingerprint(playlist)
+        start_index, start_offset = 0, 0
+        if self.resume and part_path and os.path.exists(part_path):
+            start_index, start_offset = load_checkpoint(part_path, fingerprint)
+            if start_index:
+                print(f"Resuming {os.path.basename(output_base)} at segment {start_index}/{len(segments)}")
+        remaining = segments[start_index:]
+
+        # The semaphore is released when a segment is written, not when it is fetched,
+        # so at most `concurrency` segments are buffered in memory
+        slots = asyncio.Semaphore(self.concurrency)
+        results = {}
+        ready = asyncio.Event()
+        start_time = time.time()
+        written_bytes = 0
+        byte_offset = start_offset
+
+        async def fetch_segment(segment):
+            await slots.acquire()
+            try:
+                results[segment['index']] = await self.fetch_segment_data(segment)
+            except BaseException:
+                slots.release()
+                raise
+            ready.set()
+
+        tasks = [asyncio.create_task(fetch_segment(segment)) for segment in remaining]
+        try:
+            output = open(part_path, 'r+b' if start_index else 'wb') if part_path else contextlib.nullcontext()
+            with output as f:
+                if start_index:
+                    f.truncate(start_offset)
+                    f.seek(start_offset)
+                elif playlist['init']:
+                    byte_offset += self.write_segment(
+                        f, await self.fetch(playlist['init']['url'], playlist['init']['range'])
+                    )
+
+                for index in range(start_index, len(segments)):
+                    while index not in results:
+                        if self.stop_check and self.stop_check():
+                            raise HLSStopped("Download stopped by user")
+                        failed = [t for t in tasks if t.done() and not t.cancelled() and t.exception()]
+                        if failed:
+                            raise failed[0].exception()
+                        ready.clear()
+                        await self.wait_for_ready(ready, tasks)
+                    data = results.pop(index)
+                    self.write_segment(f, data)
+                    slots.release()
+                    written_bytes += len(data)
+                    byte_offset += len(data)
+                    if self.resume and f:
+                        f.flush()
+                        save_checkpoint(part_path, fingerprint, index + 1, byte_offset)
+                    self.report_progress(index + 1, len(segments), written_bytes, start_time)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.pool.close()
+            raise
+
+        self.pool.close()
+        if not part_path:
+            return None
+        final_path = output_base + ext
+        os.replace(part_path, final_path)
+        remove_checkpoint(part_path)
+        return final_path
+
+    def write_segment(self, f, data):
+        if f:
+            f.write(data)
+        if self.segment_sink:
+            self.segment_sink(data)
+        return len(data)
+
+    async def wait_for_ready(self, ready, tasks):
+        """Wait until a segment arrives or a fetch task fails (short timeout to poll the stop flag)"""
+        waiter = asyncio.create_task(ready.wait())
+        pending = [t for t in tasks if not t.done()]
+        await asyncio.wait([waiter] + pending, timeout=0.5, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+
+    def report_progress(self, done, total, written_bytes, start_time):
+        if not self.progress_callback:
+            return
+        elapsed = max(time.time() - start_time, 0.001)
+        speed = written_bytes / elapsed / (1024 * 1024)
+        stats = f"Speed: {speed:.2f}MiB/s | Segments: {done}/{total}"
+        if self.stats['retries'] or self.stats['hedged']:
+            stats += f" | Retries: {self.stats['retries']} | Hedged: {self.stats['hedged']}"
+        self.progress_callback(done / total * 100.0, stats, written_bytes)
+
+
+def remux(path, audio_only=False):
+    """
+    Remux a download with ffmpeg (stream copy): .ts -> .mp4, or audio-only -> .m4a.
+    Keeps the original file if ffmpeg is missing or fails.
+    """
+    if not shutil.which('ffmpeg'):
+        return path
+    base, ext = os.path.splitext(path)
+    if audio_only:
+        out_path = base + '.m4a'
+        cmd = ["ffmpeg", "-y", "-i", path, "-vn", "-c:a", "copy", out_path]
+    elif ext == '.ts':
+        out_path = base + '.mp4'
+        cmd = ["ffmpeg", "-y", "-i", path, "-c", "copy", "-bsf:a", "aac_adtstoasc", out_path]
+    else:
+        return path
+    try:
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        os.remove(path)
+        return out_path
+    except (subprocess.CalledProcessError, OSError):
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        return path
+
+
+def download_hls(playlist_url, output_base, headers=None, concurrency=SEGMENT_CONCURRENCY,
+                 progress_callback=None, stop_check=None, remux_output=True, resume=False,
+                 audio_only=False, limiter=None, stats=None, segment_sink=None):
+    """
+    Blocking entry point: download an HLS stream and return the output file path
+    (None when output_base is None and the segments only went to segment_sink)
+    """
+    fetcher = HLSFetcher(headers, concurrency, progress_callback, stop_check, resume, audio_only, limiter,
+                         stats=stats, segment_sink=segment_sink)
+    path = asyncio.run(fetcher.download(playlist_url, output_base))
+    return remux(path, audio_only) if remux_output and path else path
+
+
+def probe_master(playlist_url, headers=None):
+    """Fetch a captured manifest; return the parsed master playlist or None for media playlists"""
+    pool = ConnectionPool(timeout=10)
+    try:
+        text = pool.get(playlist_url, headers or {}).decode('utf-8', errors='ignore')
+    finally:
+        pool.close()
+    playlist = parse_playlist(text, playlist_url)
+    return playlist if playlist['type'] == 'master' else None
+
+
+def estimate_stream_size(playlist_url, headers=None, audio_only=False):
+    """
+    Rough download size in bytes: bandwidth of the variant that would be
+    downloaded times the duration of its media playlist. None if unknown.
+    """
+    pool = ConnectionPool(timeout=10)
+    try:
+        text = pool.get(playlist_url, headers or {}).decode('utf-8', errors='ignore')
+        playlist = parse_playlist(text, playlist_url)
+        bandwidth = ESTIMATE_BANDWIDTH
+        if playlist['type'] == 'master':
+            media_url = select_media_playlist(playlist, audio_only, check_audio=False)
+            bandwidth = next((v['bandwidth'] for v in playlist['variants']
+                              if v['url'] == media_url and v['bandwidth']), bandwidth)
+            text = pool.get(media_url, headers or {}).decode('utf-8', errors='ignore')
+            playlist = parse_playlist(text, media_url)
+            if playlist['type'] != 'media':
+                return None
+    finally:
+        pool.close()
+
+    segments = playlist['segments']
+    if segments and all(segment['range'] for segment in segments):
+        return sum(segment['range'][1] for segment in segments)
+    duration = sum(segment['duration'] for segment in segments)
+    return int(duration * bandwidth / 8) if duration else None
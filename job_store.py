@@ -0,0 +1,200 @@
+"""
+Download Job Store
+Durable SQLite record of queued downloads so a crashed browser, closed tab
+or Ctrl-C does not lose the queue, and finished sources are not downloaded twice
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+# ----- Config -----
+JOB_DB_PATH = os.path.join("downloads", ".download_jobs.sqlite3")
+
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_key TEXT NOT NULL UNIQUE,
+    filename TEXT NOT NULL,
+    url TEXT NOT NULL,
+    source_json TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    segment_retries INTEGER NOT NULL DEFAULT 0,
+    hedged_requests INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    output_path TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+# Columns added after the first release, for databases created by older versions
+MIGRATIONS = {
+    'failures': "ALTER TABLE jobs ADD COLUMN failures INTEGER NOT NULL DEFAULT 0",
+    'segment_retries': "ALTER TABLE jobs ADD COLUMN segment_retries INTEGER NOT NULL DEFAULT 0",
+    'hedged_requests': "ALTER TABLE jobs ADD COLUMN hedged_requests INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def canonical_source_id(url):
+    """
+    Token-independent identity of a captured URL.
+    Kaltura URLs carry the entry as /key/value path pairs (or query parameters):
+    .../p/<partnerId>/sp/<..>/playManifest/entryId/<entryId>/flavorIds/<..>/a.m3u8?ks=<token>
+    Every manifest/flavor URL of one lecture maps to 'kaltura:<partnerId>:<entryId>'.
+    Other URLs are identified by host + path (query strings usually hold tokens).
+    """
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split('/') if segment]
+    path_params = {}
+    for key, value in zip(segments, segments[1:]):
+        path_params.setdefault(key.lower(), value)
+    query = {key.lower(): values[0] for key, values in parse_qs(parts.query).items() if values}
+
+    entry_id = path_params.get('entryid') or query.get('entryid')
+    if entry_id:
+        partner_id = path_params.get('p') or path_params.get('partnerid') or query.get('partnerid', '')
+        return f"kaltura:{partner_id}:{entry_id}"
+    return f"{parts.netloc.lower()}{parts.path}"
+
+
+def source_key(source):
+    """Index key of a source: canonical identity plus download mode (video, audio-only and streamed differ)"""
+    source_id = source.get('source_id') or canonical_source_id(source['url'])
+    return f"{source_id}|{source.get('mode', 'video')}"
+
+
+class JobStore:
+    """SQLite-backed download jobs, safe to use from download worker threads"""
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self.conn.execute(statement)
+            # Jobs that were running when the previous session died start over as pending
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE state = ?",
+                (STATE_PENDING, time.time(), STATE_RUNNING)
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def add_job(self, source):
+        """Insert or refresh a queued source and return its job id (finished jobs stay finished)"""
+        now = time.time()
+        key = source_key(source)
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO jobs (source_key, filename, url, source_json, state, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source_key) DO UPDATE SET
+                    filename = excluded.filename,
+                    url = excluded.url,
+                    source_json = excluded.source_json,
+                    state = CASE WHEN jobs.state = 'done' THEN 'done' ELSE 'pending' END,
+                    updated_at = excluded.updated_at
+                """,
+                (key, source['filename'], source['url'], json.dumps(source), STATE_PENDING, now, now)
+            )
+            row = self.conn.execute("SELECT id FROM jobs WHERE source_key = ?", (key,)).fetchone()
+        return row['id']
+
+    def remove_job(self, source):
+        """Forget a source that was removed from the queue (finished jobs are kept for the index)"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM jobs WHERE source_key = ? AND state != ?", (source_key(source), STATE_DONE)
+            )
+
+    def clear_unfinished(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM jobs WHERE state != ?", (STATE_DONE,))
+
+    def mark_running(self, job_id):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, started_at = ?, updated_at = ?, "
+                "error = NULL WHERE id = ?",
+                (STATE_RUNNING, now, now, job_id)
+            )
+
+    def mark_done(self, job_id, byte_count=0, output_path=None):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, bytes = ?, output_path = ?, finished_at = ?, updated_at = ? "
+                "WHERE id = ?",
+                (STATE_DONE, byte_count, output_path, now, now, job_id)
+            )
+
+    def mark_failed(self, job_id, error=None):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, failures = failures + 1, finished_at = ?, updated_at = ? "
+                "WHERE id = ?",
+                (STATE_FAILED, error, now, now, job_id)
+            )
+
+    def mark_pending(self, job_id):
+        """Stopped by the user: keep it queued for a later run"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE id = ?", (STATE_PENDING, time.time(), job_id)
+            )
+
+    def add_fetch_stats(self, job_id, retries=0, hedged=0):
+        """Accumulate segment retries and hedged requests of a download attempt"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET segment_retries = segment_retries + ?, hedged_requests = hedged_requests + ? "
+                "WHERE id = ?",
+                (retries, hedged, job_id)
+            )
+
+    def unfinished_sources(self):
+        """Sources of pending and failed jobs, oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT source_json FROM jobs WHERE state IN (?, ?) ORDER BY created_at",
+                (STATE_PENDING, STATE_FAILED)
+            ).fetchall()
+        return [json.loads(row['source_json']) for row in rows]
+
+    def finished_output(self, source):
+        """Output path of an already downloaded source if the file still exists, else None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT output_path FROM jobs WHERE source_key = ? AND state = ?",
+                (source_key(source), STATE_DONE)
+            ).fetchone()
+        if row and row['output_path'] and os.path.exists(row['output_path']):
+            return row['output_path']
+        return None
@@ -5,42 +5,42 @@ Handles command-line arguments and coordinates between downloader and transcribe
 """
 
 import argparse
+import importlib.util
+import multiprocessing
+import shutil
 import sys
 import os
-import subprocess
 from pathlib import Path
 
 # Add current directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
+import startup_profile
 
-def check_dependencies():
-    """Check if all required dependencies are installed"""
-    required_packages = [
-        'selenium',
-        'yt_dlp',
-        'whisper',
-        'webdriver_manager',
-        'faster_whisper',
-        'watchdog',
-        'tqdm'
-    ]
 
+def required_packages(args):
+    """Packages the selected mode actually uses (the openai-whisper fallback is optional)"""
+    packages = []
+    if args.mode in ('download', 'both'):
+        packages.append('selenium')
+    if args.mode in ('download', 'both', 'headless') and args.engine in ('yt-dlp', 'yt-dlp-api'):
+        packages.append('yt_dlp')
+    if args.mode in ('transcribe', 'both', 'daemon'):
+        packages += ['faster_whisper', 'watchdog', 'tqdm']
+    if getattr(args, 'stream', False):
+        packages.append('numpy')
+    return packages
 
-    missing_packages = []
-    for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
-            missing_packages.append(package)
+
+def check_dependencies(args):
+    """Check that the dependencies of the selected mode are installed, without importing them"""
+    # find_spec only locates the package; importing faster_whisper/whisper would load torch/ctranslate2
+    missing_packages = [
+        package for package in required_packages(args) if importlib.util.find_spec(package) is None
+    ]
 
     # Check FFmpeg
-    try:
-        subprocess.run(['ffmpeg', '-version'],
-                       stdout=subprocess.DEVNULL,
-                       stderr=subprocess.DEVNULL,
-                       check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    if args.mode in ('transcribe', 'both', 'daemon') and not shutil.which('ffmpeg'):
         print("[WARNING] FFmpeg not found - required for enhanced video transcription")
         print("Install from: https://ffmpeg.org/download.html")
 
@@ -50,12 +50,35 @@ def check_dependencies():
         sys.exit(1)
 
 
-def run_downloader():
+def create_downloader(args, stream_transcriber=None, on_download_complete=None):
+    """Create the downloader with the options from the command line"""
+    import download_scheduler
+    with startup_profile.step("import video_downloader"):
+        import video_downloader
+    from video_downloader import FixedModernHLSDownloader
+
+    with startup_profile.step("create downloader (job store)"):
+        return FixedModernHLSDownloader(
+            max_concurrent_downloads=args.concurrent_downloads or video_downloader.MAX_CONCURRENT_DOWNLOADS,
+            download_engine=args.engine,
+            segment_concurrency=args.segment_concurrency or video_downloader.SEGMENT_CONCURRENCY,
+            resume_downloads=not args.clean_partials,
+            download_mode="audio" if args.audio_only else "video",
+            bandwidth_limit=download_scheduler.parse_rate(args.bandwidth_limit),
+            per_host_limit=args.per_host_limit or download_scheduler.PER_HOST_LIMIT,
+            queue_policy=args.queue_order,
+            adaptive_concurrency=not args.fixed_concurrency,
+            stream_transcriber=stream_transcriber,
+            on_download_complete=on_download_complete,
+            chrome_profile_dir=None if args.fresh_profile else args.chrome_profile,
+            attach_address=args.attach_chrome
+        )
+
+
+def run_downloader(args, stream_transcriber=None, on_download_complete=None):
     """Run the video downloader"""
     try:
-        from video_downloader import FixedModernHLSDownloader
-
-        downloader = FixedModernHLSDownloader()
+        downloader = create_downloader(args, stream_transcriber, on_download_complete)
         print("Starting Video Downloader...")
         print("Opening browser - use the control panel to download videos")
 
@@ -75,26 +98,151 @@ def run_downloader():
             downloader.cleanup()
 
 
-def run_transcriber():
+def run_headless_downloader(args):
+    """Download the jobs of an exported job file without a browser"""
+    downloader = None
+    try:
+        downloader = create_downloader(args)
+        print("Starting headless batch download...")
+        if not downloader.run_headless_batch(args.job_file, args.downloads_dir):
+            sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nDownloader interrupted by user")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error running headless download: {e}")
+        sys.exit(1)
+    finally:
+        if downloader:
+            downloader.cleanup()
+
+
+def daemon_client(args):
+    """Client of a running transcription daemon, or None (then the model is loaded in this run)"""
+    from transcription_daemon import TranscriptionClient
+    client = TranscriptionClient(args.daemon_url)
+    if client.is_running():
+        print(f"Using the transcription daemon at {args.daemon_url} (model already loaded)")
+        return client
+    return None
+
+
+def wait_for_daemon_jobs(client, job_ids):
+    """Wait for submitted jobs; Ctrl+C cancels the ones still pending"""
+    try:
+        jobs = client.wait(job_ids)
+    except KeyboardInterrupt:
+        print("\nCancelling submitted transcriptions...")
+        for job_id in job_ids:
+            client.cancel(job_id)
+        return
+    done = sum(1 for job in jobs if job['state'] == 'done')
+    print(f"Transcription completed: {done} transcribed, {len(jobs) - done} failed or cancelled")
+
+
+def run_daemon_transcriber(args, client):
+    """--mode transcribe against the daemon: submit the downloaded videos and wait for them"""
+    from transcriber import get_video_files
+
+    video_files = get_video_files(args.downloads_dir)
+    if not video_files:
+        print(f"No video files found in '{args.downloads_dir}'")
+        return
+    print(f"Submitting {len(video_files)} file(s) to the transcription daemon...")
+    job_ids = [client.submit(path, args.output_dir)['id'] for path in video_files]
+    wait_for_daemon_jobs(client, job_ids)
+
+
+def run_daemon(args):
+    """Keep the model loaded and serve transcription jobs until Ctrl+C"""
+    from transcription_daemon import serve
+    host, _, port = args.daemon_url.split('://')[-1].rstrip('/').rpartition(':')
+    serve(args.output_dir, host, int(port))
+
+
+def run_transcriber(args):
     """Run the video transcriber"""
+    # --workers asks for local worker processes, so a running daemon is not used then
+    client = None if args.workers else daemon_client(args)
+    if client:
+        run_daemon_transcriber(args, client)
+        return
     try:
-        from transcriber import main as transcriber_main
+        with startup_profile.step("import transcriber"):
+            from transcriber import main as transcriber_main
         print("Starting Video Transcriber...")
         transcriber_main()
     except Exception as e:
         print(f"Error running transcriber: {e}")
 
 
-def run_both():
+def run_streaming(args):
+    """Download and transcribe at the same time: segments are decoded and transcribed as they arrive"""
+    try:
+        from transcriber import load_model
+        from stream_transcriber import StreamTranscriber
+        print("Loading Whisper model for streaming transcription...")
+        stream_transcriber = StreamTranscriber(load_model(), args.output_dir, save_video=args.keep_video)
+    except Exception as e:
+        print(f"Error loading transcription model: {e}")
+        return
+
+    print("Downloads are transcribed while they download"
+          + (" (videos are kept)" if args.keep_video else " (no video files are saved)"))
+    run_downloader(args, stream_transcriber)
+    print("\nWorkflow completed!")
+
+
+def transcription_worker(job_queue, downloads_dir, output_dir):
+    """Entry point of the transcription process (the model is only imported there)"""
+    from transcriber import run_queue_worker
+    run_queue_worker(job_queue, downloads_dir, output_dir)
+
+
+def run_both(args):
     """Run downloader then transcriber"""
+    if args.stream:
+        run_streaming(args)
+        return
+
     print("Starting Download and Transcribe workflow...")
-    print("\nStep 1: Video Download")
+    print("Finished downloads are transcribed in the background while the next ones download")
     print("=" * 40)
-    run_downloader()
 
-    print("\nStep 2: Video Transcription")
-    print("=" * 40)
-    run_transcriber()
+    client = daemon_client(args)
+    if client:
+        # The daemon already has the model loaded: downloads are submitted to it as they finish
+        from transcriber import get_video_files
+        job_ids = [client.submit(path, args.output_dir)['id'] for path in get_video_files(args.downloads_dir)]
+        run_downloader(args, on_download_complete=lambda path: job_ids.append(
+            client.submit(path, args.output_dir)['id']))
+        if job_ids:
+            print("\nDownloads finished - waiting for the daemon to transcribe them (Ctrl+C to cancel)...")
+            wait_for_daemon_jobs(client, job_ids)
+        print("\nWorkflow completed!")
+        return
+
+    # The worker loads the model once and consumes finished downloads as they arrive.
+    # spawn: the worker must not inherit the browser/download threads (or a CUDA context)
+    context = multiprocessing.get_context("spawn")
+    job_queue = context.Queue()
+    worker = context.Process(
+        target=transcription_worker,
+        args=(job_queue, args.downloads_dir, args.output_dir),
+        name="transcriber"
+    )
+    worker.start()
+
+    run_downloader(args, on_download_complete=job_queue.put)
+
+    job_queue.put(None)
+    if worker.is_alive():
+        print("\nDownloads finished - waiting for the remaining transcriptions (Ctrl+C to stop)...")
+    try:
+        worker.join()
+    except KeyboardInterrupt:
+        print("\nStopping transcription...")
+        worker.terminate()
+        worker.join()
 
     print("\nWorkflow completed!")
 
@@ -108,14 +256,31 @@ def main():
           python main.py --mode download     # Download videos only
           python main.py --mode transcribe   # Transcribe existing videos
           python main.py --mode both         # Download then transcribe
+          python main.py --mode both --audio-only   # Download audio only, then transcribe
+          python main.py --mode both --stream       # Transcribe while downloading
+          python main.py --mode daemon       # Keep the model loaded; transcribe/both then submit to it
+          python main.py --mode headless --job-file downloads/jobs_20240101_120000.json
+          python main.py --mode download --attach-chrome 127.0.0.1:9222   # Use an already open Chrome
         """
     )
 
     parser.add_argument(
         '--mode',
-        choices=['download', 'transcribe', 'both'],
+        choices=['download', 'transcribe', 'both', 'headless', 'daemon'],
         required=True,
-        help='Operation mode: download videos, transcribe videos, or both'
+        help='Operation mode: download videos, transcribe videos, both, headless (download a job file), '
+             'or daemon (serve transcription jobs with the model kept loaded)'
+    )
+
+    parser.add_argument(
+        '--daemon-url',
+        default=None,
+        help='Address of the transcription daemon (default: http://127.0.0.1:8737)'
+    )
+
+    parser.add_argument(
+        '--job-file',
+        help='Job file exported from the panel (required for --mode headless)'
     )
 
     parser.add_argument(
@@ -130,10 +295,146 @@ def main():
         help='Directory for transcription output (default: transcriptions)'
     )
 
+    parser.add_argument(
+        '--concurrent-downloads',
+        type=int,
+        default=None,
+        help='Number of queue items to download in parallel (default: 3)'
+    )
+
+    parser.add_argument(
+        '--engine',
+        choices=['yt-dlp', 'yt-dlp-api', 'native'],
+        default='yt-dlp',
+        help='Download engine: yt-dlp subprocess, yt-dlp in-process (no per-video startup) '
+             'or built-in parallel HLS fetcher (default: yt-dlp)'
+    )
+
+    parser.add_argument(
+        '--segment-concurrency',
+        type=int,
+        default=None,
+        help='Segments fetched in parallel per video with --engine native (default: 8)'
+    )
+
+    parser.add_argument(
+        '--clean-partials',
+        action='store_true',
+        help='Delete partial files of stopped/failed downloads instead of keeping them for resume'
+    )
+
+    parser.add_argument(
+        '--audio-only',
+        action='store_true',
+        help='Download only the audio rendition (or lowest-bitrate variant) - enough for transcription'
+    )
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='With --mode both: transcribe each lecture while it downloads (native engine, no intermediate files)'
+    )
+
+    parser.add_argument(
+        '--keep-video',
+        action='store_true',
+        help='With --stream: also save the downloaded video'
+    )
+
+    parser.add_argument(
+        '--bandwidth-limit',
+        default=None,
+        help='Total download bandwidth for all parallel downloads, e.g. 800K or 5M bytes/s (default: unlimited)'
+    )
+
+    parser.add_argument(
+        '--per-host-limit',
+        type=int,
+        default=None,
+        help='Maximum simultaneous connections and downloads per host (default: 12)'
+    )
+
+    parser.add_argument(
+        '--queue-order',
+        choices=['fifo', 'shortest-first'],
+        default='fifo',
+        help='Order of queued downloads: as queued, or smallest estimated size first (default: fifo)'
+    )
+
+    parser.add_argument(
+        '--fixed-concurrency',
+        action='store_true',
+        help='Always run --concurrent-downloads at once instead of adapting to throughput and errors'
+    )
+
+    parser.add_argument(
+        '--chrome-profile',
+        default='chrome-profile',
+        help='Persistent Chrome profile directory, keeps you logged in between runs (default: chrome-profile)'
+    )
+
+    parser.add_argument(
+        '--fresh-profile',
+        action='store_true',
+        help='Use a temporary Chrome profile (log in again every run)'
+    )
+
+    parser.add_argument(
+        '--attach-chrome',
+        metavar='HOST:PORT',
+        default=None,
+        help='Attach to a running Chrome started with --remote-debugging-port (e.g. 127.0.0.1:9222)'
+    )
+
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=None,
+        help='Transcribe this many speech chunks at once with the batched pipeline, '
+             'e.g. 8-16 to use all CPU cores (default: 0 = one after another)'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='With --mode transcribe: batch-transcribe with N processes, each with its own model '
+             'and cores/N CPU threads (default: 1)'
+    )
+
+    parser.add_argument(
+        '--startup-profile',
+        action='store_true',
+        help='Print how long imports and initialization steps take (and peak memory)'
+    )
+
     args = parser.parse_args()
+    if not args.daemon_url:
+        from transcription_daemon import DAEMON_URL
+        args.daemon_url = DAEMON_URL
+    if args.startup_profile:
+        # Through the environment, so the transcription worker process reports as well
+        startup_profile.enable()
+    if args.mode == 'headless' and not args.job_file:
+        parser.error("--mode headless requires --job-file")
+    if args.stream and args.mode != 'both':
+        parser.error("--stream requires --mode both")
+    if args.batch_size is not None and args.batch_size < 0:
+        parser.error("--batch-size must be 0 or more")
+    if args.workers is not None and (args.workers < 1 or args.mode != 'transcribe'):
+        parser.error("--workers must be 1 or more and requires --mode transcribe")
+    if args.bandwidth_limit:
+        import download_scheduler
+        try:
+            rate = download_scheduler.parse_rate(args.bandwidth_limit)
+        except ValueError:
+            rate = None
+        if not rate or rate <= 0:
+            parser.error(f"invalid --bandwidth-limit: {args.bandwidth_limit} (must be a positive rate, e.g. 800K)")
 
     # Check dependencies
-    check_dependencies()
+    with startup_profile.step("dependency check"):
+        check_dependencies(args)
 
     # Create directories if they don't exist
     os.makedirs(args.downloads_dir, exist_ok=True)
@@ -142,14 +443,22 @@ def main():
     # Set environment variables for transcriber
     os.environ['TRANSCRIBER_INPUT_DIR'] = args.downloads_dir
     os.environ['TRANSCRIBER_OUTPUT_DIR'] = args.output_dir
+    if args.batch_size is not None:
+        os.environ['TRANSCRIBER_BATCH_SIZE'] = str(args.batch_size)
+    if args.workers:
+        os.environ['TRANSCRIBER_WORKERS'] = str(args.workers)
 
     # Run selected mode
     if args.mode == 'download':
-        run_downloader()
+        run_downloader(args)
     elif args.mode == 'transcribe':
-        run_transcriber()
+        run_transcriber(args)
     elif args.mode == 'both':
-        run_both()
+        run_both(args)
+    elif args.mode == 'headless':
+        run_headless_downloader(args)
+    elif args.mode == 'daemon':
+        run_daemon(args)
 
 
 if __name__ == "__main__":
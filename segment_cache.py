@@ -0,0 +1,108 @@
+"""
+Segment Cache
+Raw transcription segments keyed by the content hash of the media file plus the model,
+language and decode settings, so a renamed or duplicate lecture (or a deleted output
+file) is written again from the cache instead of being transcribed again
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+# ----- Config -----
+SEGMENT_CACHE_DIR = Path("transcriptions") / "_cache" / "segments"
+SEGMENT_CACHE_MAX_MB = 200  # least recently used entries are evicted above this size
+HASH_SAMPLE_SIZE = 4 * 1024 * 1024  # bytes hashed at the start and at the end of the file
+
+CachedSegment = namedtuple('CachedSegment', ['start', 'end', 'text', 'avg_logprob', 'words'])
+
+_evict_lock = threading.Lock()
+
+
+def content_hash(path):
+    """
+    Identity of the file contents (the name does not matter): the size plus a SHA-256 of the
+    first and last HASH_SAMPLE_SIZE bytes, so building a key never reads a whole lecture
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(HASH_SAMPLE_SIZE))
+        if size > 2 * HASH_SAMPLE_SIZE:
+            f.seek(-HASH_SAMPLE_SIZE, os.SEEK_END)
+        digest.update(f.read(HASH_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def cache_key(path, params):
+    """Key of one file transcribed with the given settings (model, language, decode options)"""
+    data = json.dumps({'content': content_hash(path), **params}, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def entry_path(key, cache_dir=SEGMENT_CACHE_DIR):
+    return Path(cache_dir) / f"{key}.json"
+
+
+def load(key, cache_dir=SEGMENT_CACHE_DIR):
+    """Cached segments, or None on a miss (an empty list is a hit: the file has no speech)"""
+    path = entry_path(key, cache_dir)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        os.utime(path)  # mtime = last use, for LRU eviction
+    except (OSError, ValueError):
+        return None
+    return [CachedSegment(s['start'], s['end'], s['text'], s.get('avg_logprob'), s.get('words'))
+            for s in data['segments']]
+
+
+def store(key, segments, cache_dir=SEGMENT_CACHE_DIR, max_mb=SEGMENT_CACHE_MAX_MB):
+    """Save faster-whisper segments (timestamps, text, avg_logprob and word timings if present)"""
+    items = []
+    for s in segments:
+        words = getattr(s, 'words', None)
+        items.append({
+            'start': float(s.start),
+            'end': float(s.end),
+            'text': s.text,
+            'avg_logprob': getattr(s, 'avg_logprob', None),
+            'words': [
+                {'start': float(w.start), 'end': float(w.end), 'word': w.word, 'probability': w.probability}
+                for w in words
+            ] if words else None
+        })
+
+    path = entry_path(key, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'created_at': time.time(), 'segments': items}, f)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_mb)
+
+
+def evict(cache_dir=SEGMENT_CACHE_DIR, max_mb=SEGMENT_CACHE_MAX_MB):
+    """Delete least recently used entries until the cache fits in max_mb"""
+    with _evict_lock:
+        entries = []
+        for path in Path(cache_dir).glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_mb * 1024 * 1024:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
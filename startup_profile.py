@@ -0,0 +1,55 @@
+"""
+Startup Profile
+Timing (and peak memory) of imports and initialization steps, enabled with
+main.py --startup-profile. The setting is passed to worker processes through
+the environment.
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ----- Config -----
+ENV_VAR = "VIDEO_TRANSCRIBER_STARTUP_PROFILE"
+
+PROCESS_START = time.perf_counter()
+
+
+def enable():
+    os.environ[ENV_VAR] = "1"
+
+
+def enabled():
+    return os.environ.get(ENV_VAR) == "1"
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where it cannot be measured"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@contextmanager
+def step(label):
+    """Time one startup step and print it when profiling is on"""
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        since_start = (time.perf_counter() - PROCESS_START) * 1000
+        rss = peak_rss_mb()
+        memory = f" | peak RSS {rss:.0f} MB" if rss is not None else ""
+        print(f"[STARTUP] {label}: {elapsed:.1f} ms (t+{since_start:.0f} ms){memory}")
@@ -0,0 +1,160 @@
+"""
+Streaming Transcriber
+Decodes HLS segments with ffmpeg while they are downloading and feeds the
+16 kHz PCM to faster-whisper chunk by chunk, so transcription overlaps the download
+"""
+
+import queue
+import subprocess
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from transcriber import DECODE_OPTIONS, LANG_HINT, run_model, transcribe_video, write_transcripts
+
+# ----- Config -----
+SAMPLE_RATE = 16000
+CHUNK_SECONDS = 300  # audio per model.transcribe call
+SPLIT_SEARCH_SECONDS = 10  # a chunk is cut at the quietest 0.1 s within its last seconds
+READ_SIZE = 64 * 1024
+
+TranscriptSegment = namedtuple('TranscriptSegment', ['start', 'end', 'text'])
+
+
+def format_seconds(seconds):
+    return f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{int(seconds % 60):02d}"
+
+
+class StreamTranscriber:
+    """Model and output settings shared by all streaming downloads"""
+
+    def __init__(self, model, output_dir, save_video=False):
+        self.model = model
+        self.output_dir = Path(output_dir)
+        self.save_video = save_video
+        # One model call at a time; parallel downloads take turns chunk by chunk
+        self.model_lock = threading.Lock()
+
+    def open(self, name):
+        return TranscriptionStream(self, name)
+
+    def transcribe_file(self, path):
+        """For downloads that could not be streamed (e.g. yt-dlp fallback): transcribe the finished file"""
+        with self.model_lock:
+            return transcribe_video(self.model, path, self.output_dir)
+
+
+class TranscriptionStream:
+    """One lecture: segments go in through an ffmpeg decode pipe, transcript files come out"""
+
+    def __init__(self, transcriber, name):
+        self.transcriber = transcriber
+        self.name = name
+        self.language = LANG_HINT
+        self.chunks = queue.Queue()
+        self.segments = []
+        self.error = None
+        self.aborted = False
+
+        self.process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+             "-vn", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self.reader = threading.Thread(target=self.read_pcm, name=f"pcm-{name}", daemon=True)
+        self.worker = threading.Thread(target=self.transcribe_chunks, name=f"stt-{name}", daemon=True)
+        self.reader.start()
+        self.worker.start()
+
+    def write(self, data):
+        """Segment sink for hls_fetcher: pass the next segment to the decoder"""
+        if self.error:
+            raise RuntimeError(f"Transcription failed: {self.error}")
+        self.process.stdin.write(data)
+
+    def read_pcm(self):
+        """Cut the decoded PCM into chunks for the transcription worker"""
+        chunk_bytes = CHUNK_SECONDS * SAMPLE_RATE * 2
+        buffer = bytearray()
+        offset = 0  # samples handed to the worker so far
+        while True:
+            data = self.process.stdout.read1(READ_SIZE)
+            if not data:
+                break
+            buffer += data
+            while len(buffer) >= chunk_bytes:
+                cut = self.split_point(buffer, chunk_bytes)
+                self.chunks.put((offset / SAMPLE_RATE, bytes(buffer[:cut])))
+                offset += cut // 2
+                del buffer[:cut]
+        if len(buffer) >= 2:
+            self.chunks.put((offset / SAMPLE_RATE, bytes(buffer[:len(buffer) // 2 * 2])))
+        self.chunks.put(None)
+
+    def split_point(self, buffer, chunk_bytes):
+        """Byte offset near the end of the chunk with the least energy, so words are not cut in half"""
+        frame = SAMPLE_RATE // 10
+        samples = np.frombuffer(buffer, dtype=np.int16, count=chunk_bytes // 2)
+        search = min(len(samples), SPLIT_SEARCH_SECONDS * SAMPLE_RATE) // frame * frame
+        tail = samples[len(samples) - search:].astype(np.float32).reshape(-1, frame)
+        quietest = int(np.argmin((tail ** 2).mean(axis=1)))
+        return (len(samples) - search + quietest * frame + frame // 2) * 2
+
+    def transcribe_chunks(self):
+        """Worker: transcribe chunks as they are decoded and shift the timestamps to the lecture"""
+        model = self.transcriber.model
+        while True:
+            item = self.chunks.get()
+            if item is None:
+                return
+            if self.error or self.aborted:
+                continue
+            start, pcm = item
+            audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+            try:
+                with self.transcriber.model_lock:
+                    segments, info = run_model(
+                        model,
+                        audio,
+                        language=self.language,
+                        **DECODE_OPTIONS
+                    )
+                    for s in segments:
+                        self.segments.append(TranscriptSegment(start + s.start, start + s.end, s.text))
+                if self.language is None:
+                    # The first chunk decides the language for the rest of the lecture
+                    self.language = info.language
+                    print(f"[INFO] Detected language: {info.language} (prob={info.language_probability:.2f})")
+                end = start + len(audio) / SAMPLE_RATE
+                print(f"[STREAM] {self.name}: transcribed up to {format_seconds(end)}")
+            except Exception as e:
+                self.error = e
+
+    def finish(self):
+        """End of the stream: wait for the last chunk and write TXT/SRT/VTT; returns the TXT path"""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        return_code = self.process.wait()
+        self.reader.join()
+        self.worker.join()
+        if self.error:
+            raise RuntimeError(f"Transcription failed: {self.error}")
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg could not decode the stream (exit code {return_code})")
+
+        self.transcriber.output_dir.mkdir(parents=True, exist_ok=True)
+        return write_transcripts(self.transcriber.output_dir / self.name, self.name, self.segments)
+
+    def abort(self):
+        """Download failed or stopped: drop the decoder and any queued audio"""
+        self.aborted = True
+        try:
+            self.process.kill()
+        except OSError:
+            pass
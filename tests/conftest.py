@@ -0,0 +1,25 @@
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from hls_server import PlaylistHandler
+
+
+@pytest.fixture
+def server():
+    PlaylistHandler.requested = []
+    PlaylistHandler.stalled = set()
+    PlaylistHandler.release.clear()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PlaylistHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    PlaylistHandler.release.set()
+    httpd.shutdown()
+    httpd.server_close()
@@ -0,0 +1,56 @@
+"""Synthetic HLS stream for the tests: a media playlist with randomly delayed segments"""
+
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+SEGMENT_COUNT = 12
+
+
+def segment_body(index):
+    return f"segment-{index:03d};".encode() * 200
+
+
+def playlist_text():
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:2"]
+    for index in range(SEGMENT_COUNT):
+        lines += ["#EXTINF:2.0,", f"seg{index}.ts"]
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines)
+
+
+class PlaylistHandler(BaseHTTPRequestHandler):
+    requested = []
+    # Segments that send half of their body and then hang until release is set
+    stalled = set()
+    release = threading.Event()
+
+    def do_GET(self):
+        if self.path == "/media.m3u8":
+            body = playlist_text().encode()
+        elif self.path.startswith("/seg"):
+            index = int(self.path[4:-3])
+            self.requested.append(index)
+            # Random latency so segments finish out of order
+            time.sleep(random.uniform(0, 0.05))
+            body = segment_body(index)
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.path.startswith("/seg") and index in self.stalled:
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.release.wait(60)
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def expected_output(start=0):
+    return b"".join(segment_body(index) for index in range(start, SEGMENT_COUNT))
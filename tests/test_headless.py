@@ -0,0 +1,27 @@
+"""Headless batch downloads from an exported job file, without a browser"""
+
+import json
+
+import hls_fetcher
+from hls_server import expected_output
+from video_downloader import FixedModernHLSDownloader
+
+
+def test_job_file_without_referers(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # No ffmpeg needed: keep the raw .ts
+    monkeypatch.setattr(hls_fetcher, "remux", lambda path, audio_only=False: path)
+
+    job_file = tmp_path / "jobs.json"
+    job_file.write_text(json.dumps({
+        "cookies": [{"name": "session", "value": "abc"}],
+        "jobs": [{"filename": "Lecture 1", "url": f"{server}/media.m3u8"}]
+    }))
+
+    downloader = FixedModernHLSDownloader(download_engine="native", job_db_path=str(tmp_path / "jobs.sqlite3"))
+    assert downloader.driver is None
+    assert downloader.run_headless_batch(str(job_file), str(tmp_path / "downloads"))
+
+    outputs = list((tmp_path / "downloads").glob("Lecture 1*"))
+    assert len(outputs) == 1
+    assert outputs[0].read_bytes() == expected_output()
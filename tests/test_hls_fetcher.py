@@ -0,0 +1,60 @@
+"""Native HLS fetcher against a synthetic playlist served by a local http.server"""
+
+import time
+from pathlib import Path
+
+import pytest
+
+import download_scheduler
+import hls_fetcher
+from hls_server import PlaylistHandler, expected_output, playlist_text
+
+
+def test_segments_are_written_in_order(server, tmp_path):
+    path = hls_fetcher.download_hls(f"{server}/media.m3u8", str(tmp_path / "lecture"),
+                                    concurrency=6, remux_output=False)
+
+    assert path == str(tmp_path / "lecture.ts")
+    assert Path(path).read_bytes() == expected_output()
+
+
+def test_resume_continues_from_checkpoint(server, tmp_path):
+    output_base = str(tmp_path / "lecture")
+    written = {'segments': 0}
+
+    def on_progress(percent, stats, written_bytes):
+        written['segments'] += 1
+
+    with pytest.raises(hls_fetcher.HLSStopped):
+        hls_fetcher.download_hls(f"{server}/media.m3u8", output_base, concurrency=1,
+                                 progress_callback=on_progress, stop_check=lambda: written['segments'] >= 5,
+                                 remux_output=False, resume=True)
+
+    part_path = output_base + ".ts.part"
+    playlist = hls_fetcher.parse_playlist(playlist_text(), f"{server}/media.m3u8")
+    next_index, byte_offset = hls_fetcher.load_checkpoint(part_path, hls_fetcher.playlist_fingerprint(playlist))
+    assert next_index >= 5
+    assert byte_offset == len(expected_output()) - len(expected_output(next_index))
+
+    PlaylistHandler.requested = []
+    path = hls_fetcher.download_hls(f"{server}/media.m3u8", output_base, concurrency=4,
+                                    remux_output=False, resume=True)
+
+    assert min(PlaylistHandler.requested) == next_index
+    assert Path(path).read_bytes() == expected_output()
+    assert not Path(hls_fetcher.checkpoint_path(part_path)).exists()
+
+
+@pytest.mark.parametrize("bandwidth_limit", [None, 1024 ** 3])
+def test_stop_interrupts_a_stalled_segment(server, tmp_path, bandwidth_limit):
+    PlaylistHandler.stalled = {3}
+    limiter = download_scheduler.DownloadScheduler(4, bandwidth_limit=bandwidth_limit) if bandwidth_limit else None
+    start = time.monotonic()
+
+    with pytest.raises(hls_fetcher.HLSStopped):
+        hls_fetcher.download_hls(f"{server}/media.m3u8", str(tmp_path / "lecture"), concurrency=4,
+                                 stop_check=lambda: time.monotonic() - start > 0.5,
+                                 remux_output=False, limiter=limiter)
+
+    # The blocked read is aborted instead of running into the request timeout
+    assert time.monotonic() - start < 5
@@ -7,73 +7,143 @@ Reads from downloads folder by default
 import os
 import sys
 import time
+import queue
 import threading
+import multiprocessing
 import subprocess
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from faster_whisper import WhisperModel
 from tqdm import tqdm
 
+import segment_cache
+import startup_profile
+
+if TYPE_CHECKING:
+    # faster_whisper pulls in ctranslate2 and friends; it is imported in load_model() only
+    from faster_whisper import WhisperModel
+
 # Make sure required folders exist
 os.makedirs("downloads", exist_ok=True)
 os.makedirs("transcriptions", exist_ok=True)
 
 # ----- Config -----
 CACHE_DIR = Path("transcriptions") / "_cache"
+SAMPLE_RATE = 16000  # the model input: 16 kHz mono float32
 
 MODEL_SIZE = "medium"  # tiny/base/small/medium/large-v3
 LANG_HINT = "nl"  # hint voor Nederlands; None = autodetect
 USE_GPU = True  # False als je geen NVIDIA GPU hebt
 COMPUTE_TYPE = "float16" if USE_GPU else "int8"
+# Speech chunks decoded together by faster-whisper's BatchedInferencePipeline (0 = one after another).
+# Overridden by main.py --batch-size through TRANSCRIBER_BATCH_SIZE
+BATCH_SIZE = 0
+# Decode settings (also part of the segment cache key)
+DECODE_OPTIONS = {"vad_filter": True, "beam_size": 5, "task": "transcribe"}
+# Batch mode decodes the audio of this many upcoming files while the model works. Decoded audio is
+# kept as int16 until its turn (about 230 MB for a 2-hour lecture), so keep this small
+PREFETCH_DEPTH = 1
+# Batch mode with more than one worker process: each loads its own model with cores/WORKERS CPU threads.
+# Overridden by main.py --workers through TRANSCRIBER_WORKERS
+WORKERS = 1
+# Watch mode: a file is picked up once it had no events and kept the same size for WATCH_DEBOUNCE seconds;
+# WATCH_WORKERS transcriptions run at once and further files wait their turn
+WATCH_DEBOUNCE = 2.0
+WATCH_WORKERS = 1
 
 # Video extensions (expanded from your original)
 VIDEO_EXTS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".flv", ".wmv", ".m4v", ".3gp", ".ts"}
+# Audio-only downloads (main.py --audio-only) are transcribed as well
+AUDIO_EXTS = {".m4a", ".aac", ".mp3", ".wav"}
+MEDIA_EXTS = VIDEO_EXTS | AUDIO_EXTS
 
 # ---- Progress helpers ----
 PROG_LOCK = threading.Lock()
 PROG_NEXT_POS = 0
+PROG_FIXED_POS = None  # --workers processes: every bar of a worker uses that worker's line
 
 
 # ------ Helpers ------
-def is_file_stable(path: Path, wait_seconds=2):
-    """Wacht tot bestand niet meer groeit (klaar met kopiëren/export)."""
-    last_size = -1
-    while True:
-        try:
-            size = path.stat().st_size
-            if size == last_size:
-                return True
-            last_size = size
-            time.sleep(wait_seconds)
-        except FileNotFoundError:
-            return False
-
-
-def extract_audio_from_video(input_path: Path) -> Path:
+def read_wav_header(path: Path):
+    """(data offset, sample count) of a 16 kHz mono 16-bit PCM WAV file, otherwise None"""
+    try:
+        with open(path, "rb") as f:
+            if f.read(12)[8:12] != b"WAVE":
+                return None
+            pcm_format = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                chunk_id, size = header[:4], int.from_bytes(header[4:], "little")
+                if chunk_id == b"fmt ":
+                    fmt = f.read(size)
+                    # audio format, channels, sample rate ... bits per sample
+                    pcm_format = (int.from_bytes(fmt[0:2], "little"), int.from_bytes(fmt[2:4], "little"),
+                                  int.from_bytes(fmt[4:8], "little"), int.from_bytes(fmt[14:16], "little"))
+                    f.seek(size % 2, 1)
+                elif chunk_id == b"data":
+                    if pcm_format != (1, 1, SAMPLE_RATE, 16):
+                        return None
+                    data_size = min(size, path.stat().st_size - f.tell())
+                    return f.tell(), data_size // 2
+                else:
+                    f.seek(size + size % 2, 1)
+    except OSError:
+        return None
+
+
+def load_audio(input_path: Path, duration=None):
     """
-    Extracteer audio naar wav (16kHz mono) voor video bestanden.
+    Decoded 16 kHz mono audio as an int16 array, without a temporary WAV file.
+    16 kHz mono PCM WAV files are memory-mapped; everything else is decoded by ffmpeg
+    into a pipe that is read straight into an array preallocated from the duration.
+    pcm_to_float() makes the model input just before transcription (half the memory while waiting).
     """
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    out_wav = CACHE_DIR / (input_path.stem + "_audio.wav")
+    import numpy as np
 
-    # Skip extraction if audio file already exists
-    if out_wav.exists():
-        return out_wav
+    wav = read_wav_header(input_path) if input_path.suffix.lower() == ".wav" else None
+    if wav:
+        offset, count = wav
+        return np.memmap(input_path, dtype="<i2", mode="r", offset=offset, shape=(count,))
 
     cmd = [
-        "ffmpeg", "-y", "-i", str(input_path),
-        "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
-        str(out_wav)
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", str(input_path),
+        "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "pipe:1"
     ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-    try:
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-        return out_wav
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] FFmpeg failed for {input_path.name}: {e}")
-        raise
+    pcm = np.empty(int((duration or 60) * SAMPLE_RATE) + SAMPLE_RATE, dtype="<i2")
+    view = memoryview(pcm).cast("B")
+    filled = 0  # bytes
+    while True:
+        if filled == len(view):
+            # Longer than ffprobe said (or no duration): grow by half
+            view.release()
+            pcm = np.resize(pcm, len(pcm) * 3 // 2)
+            view = memoryview(pcm).cast("B")
+        read = process.stdout.readinto(view[filled:])
+        if not read:
+            break
+        filled += read
+    view.release()
+
+    errors = process.stderr.read().decode("utf-8", errors="ignore").strip()
+    if process.wait() != 0:
+        print(f"[ERROR] FFmpeg failed for {input_path.name}: {errors}")
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}")
+    samples = filled // 2
+    # Do not keep a much larger buffer alive for the rest of the batch
+    return pcm[:samples] if samples > len(pcm) * 0.9 else pcm[:samples].copy()
+
+
+def pcm_to_float(pcm):
+    """int16 PCM -> float32 in [-1, 1), the input faster-whisper expects"""
+    import numpy as np
+    return np.multiply(pcm, 1 / 32768.0, dtype=np.float32)
 
 
 def get_video_duration_seconds(path: Path) -> float | None:
@@ -95,6 +165,32 @@ def get_video_duration_seconds(path: Path) -> float | None:
     return None
 
 
+def prepare_audio(input_path: Path):
+    """ffprobe and decoding of one file: (int16 pcm, total_seconds)"""
+    total_seconds = get_video_duration_seconds(input_path)
+    audio = load_audio(input_path, total_seconds)
+    return audio, total_seconds or len(audio) / SAMPLE_RATE
+
+
+def prefetch_audio(input_path: Path, output_dir):
+    """
+    Background part of batch mode: None when the file needs no audio (transcripts exist or its
+    segments are cached), otherwise prepare_audio(). Runs entirely in the prefetch thread.
+    """
+    try:
+        if has_transcripts(Path(output_dir) / input_path.stem):
+            return None
+        if segment_cache.load(segment_cache.cache_key(input_path, cache_params())) is not None:
+            return None
+    except OSError:
+        return None  # unreadable: transcribe_video reports the error
+    return prepare_audio(input_path)
+
+
+def has_transcripts(base: Path):
+    return all(base.with_suffix(ext).exists() for ext in (".txt", ".srt", ".vtt"))
+
+
 def get_video_files(input_dir):
     """Get all video files from the input directory"""
     video_files = []
@@ -103,16 +199,116 @@ def get_video_files(input_dir):
     if not input_path.exists():
         return video_files
 
-    for ext in VIDEO_EXTS:
+    for ext in MEDIA_EXTS:
         video_files.extend(input_path.glob(f"*{ext}"))
         video_files.extend(input_path.glob(f"*{ext.upper()}"))
 
     return sorted(video_files)
 
 
+def write_transcripts(base: Path, source_name, segs):
+    """Write TXT, SRT and VTT files for the segments (anything with .start, .end and .text)"""
+    # Write TXT file (original format)
+    txt_path = base.with_suffix(".txt")
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write(f"Transcription of: {source_name}\n")
+        f.write("=" * 50 + "\n\n")
+        for s in segs:
+            f.write(s.text.strip() + "\n")
+
+    # SRT format function
+    def fmt_ts_srt(t):
+        h = int(t // 3600)
+        m = int((t % 3600) // 60)
+        s = int(t % 60)
+        ms = int((t - int(t)) * 1000)
+        return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+    srt_path = base.with_suffix(".srt")
+    with open(srt_path, "w", encoding="utf-8") as f:
+        for i, s in enumerate(segs, start=1):
+            f.write(f"{i}\n{fmt_ts_srt(s.start)} --> {fmt_ts_srt(s.end)}\n{s.text.strip()}\n\n")
+
+    # VTT format function
+    def fmt_ts_vtt(t):
+        h = int(t // 3600)
+        m = int((t % 3600) // 60)
+        s = int(t % 60)
+        ms = int((t - int(t)) * 1000)
+        return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+    vtt_path = base.with_suffix(".vtt")
+    with open(vtt_path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n")
+        for s in segs:
+            f.write(f"{fmt_ts_vtt(s.start)} --> {fmt_ts_vtt(s.end)}\n{s.text.strip()}\n\n")
+
+    print(f"✓ Saved transcriptions: {txt_path.name}, {srt_path.name}, {vtt_path.name}")
+    return txt_path
+
+
+def load_model(cpu_threads=0) -> "WhisperModel":
+    """Load the faster-whisper model with the configured size, device and compute type (cpu_threads 0 = all cores)"""
+    with startup_profile.step("import faster_whisper"):
+        from faster_whisper import WhisperModel
+        import faster_whisper
+
+    if batch_size() > 1 and not hasattr(faster_whisper, "BatchedInferencePipeline"):
+        raise RuntimeError("--batch-size needs faster-whisper 1.1.0 or newer (pip install -U faster-whisper)")
+
+    device = "cuda" if USE_GPU else "cpu"
+    with startup_profile.step(f"load Whisper model ({MODEL_SIZE})"):
+        model = WhisperModel(MODEL_SIZE, device=device, compute_type=COMPUTE_TYPE, cpu_threads=cpu_threads)
+
+    try:
+        d = getattr(model, "device", device)
+    except Exception:
+        d = device
+    print(f"✓ Model loaded successfully")
+    print(f"[DEBUG] Model device: {d} | compute_type: {COMPUTE_TYPE}")
+    return model
+
+
+def worker_count() -> int:
+    return max(1, int(os.environ.get('TRANSCRIBER_WORKERS', WORKERS)))
+
+
+def batch_size() -> int:
+    return int(os.environ.get('TRANSCRIBER_BATCH_SIZE', BATCH_SIZE))
+
+
+def run_model(model: "WhisperModel", audio, **options):
+    """
+    model.transcribe, or the batched pipeline when a batch size is set: the VAD speech chunks
+    then go through the encoder and decoder together. Both yield the same Segment tuples.
+    """
+    size = batch_size()
+    if size > 1:
+        from faster_whisper import BatchedInferencePipeline
+        return BatchedInferencePipeline(model=model).transcribe(audio, batch_size=size, **options)
+    return model.transcribe(audio, **options)
+
+
+def cache_params():
+    """Everything besides the file contents that changes the segments"""
+    return {
+        'model': MODEL_SIZE,
+        'compute_type': COMPUTE_TYPE,
+        'language': LANG_HINT,
+        'batch_size': batch_size(),
+        **DECODE_OPTIONS
+    }
+
+
 # ------ Original transcribe_video function enhanced ------
-def transcribe_video(model: WhisperModel, video_path, output_dir):
-    """Transcribe a single video file with enhanced features"""
+def transcribe_video(model: "WhisperModel", video_path, output_dir, cancel_check=None, progress_callback=None,
+                     prepared=None):
+    """
+    Transcribe a single video file with enhanced features.
+    cancel_check() is polled between segments (True = stop without writing output);
+    progress_callback(seconds_done, total_seconds) follows the transcription;
+    prepared is a future of prepare_audio() already started in the background.
+    """
     input_path = Path(video_path)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -120,24 +316,36 @@ def transcribe_video(model: WhisperModel, video_path, output_dir):
     base = output_dir / input_path.stem
 
     # Skip if output already exists
-    if (base.with_suffix(".txt").exists() and
-            base.with_suffix(".srt").exists() and
-            base.with_suffix(".vtt").exists()):
+    if has_transcripts(base):
         print(f"[SKIP] Transcriptie bestaat al: {input_path.name}")
         return True
 
-    print(f"Transcribing: {input_path.name}")
-
     try:
-        # Extract audio from video
-        audio_path = extract_audio_from_video(input_path)
+        # Same contents transcribed with the same settings before (renamed/duplicate file, deleted outputs)
+        key = segment_cache.cache_key(input_path, cache_params())
+        cached = segment_cache.load(key)
+        if cached is not None:
+            if prepared:
+                prepared.cancel()
+            print(f"[CACHE] {input_path.name}: writing transcripts from cached segments")
+            write_transcripts(base, input_path.name, cached)
+            return True
+
+        print(f"Transcribing: {input_path.name}")
+
+        # Decode the audio and measure the duration (or wait for the prefetch)
+        pcm, total_seconds = (prepared.result() if prepared else None) or prepare_audio(input_path)
+        audio = pcm_to_float(pcm)
+        del pcm
 
         # --- Voortgangsbalk ---
-        total_seconds = get_video_duration_seconds(input_path)
         with PROG_LOCK:
             global PROG_NEXT_POS
-            pos = PROG_NEXT_POS
-            PROG_NEXT_POS += 1
+            if PROG_FIXED_POS is not None:
+                pos = PROG_FIXED_POS
+            else:
+                pos = PROG_NEXT_POS
+                PROG_NEXT_POS += 1
 
         bar = tqdm(total=total_seconds if total_seconds else 0,
                    unit="s", position=pos, leave=False,
@@ -145,19 +353,23 @@ def transcribe_video(model: WhisperModel, video_path, output_dir):
                    desc=input_path.name)
 
         try:
-            segments, info = model.transcribe(
-                str(audio_path),
-                vad_filter=True,
-                beam_size=5,
+            segments, info = run_model(
+                model,
+                audio,
                 language=LANG_HINT,
-                task="transcribe"
+                **DECODE_OPTIONS
             )
             print(f"[INFO] Detected language: {info.language} (prob={info.language_probability:.2f})")
 
             segs = []
             last_shown = 0.0
             for s in segments:
+                if cancel_check and cancel_check():
+                    print(f"[CANCELLED] {input_path.name}")
+                    return False
                 segs.append(s)
+                if progress_callback:
+                    progress_callback(float(s.end), total_seconds)
                 if total_seconds:
                     inc = max(0.0, float(s.end) - last_shown)
                     last_shown = float(s.end)
@@ -168,52 +380,15 @@ def transcribe_video(model: WhisperModel, video_path, output_dir):
                 bar.total = last_end
                 bar.update(max(0.0, bar.total - bar.n))
 
-            # Write TXT file (original format)
-            txt_path = base.with_suffix(".txt")
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(f"Transcription of: {input_path.name}\n")
-                f.write("=" * 50 + "\n\n")
-                for s in segs:
-                    f.write(s.text.strip() + "\n")
-
-            # SRT format function
-            def fmt_ts_srt(t):
-                h = int(t // 3600)
-                m = int((t % 3600) // 60)
-                s = int(t % 60)
-                ms = int((t - int(t)) * 1000)
-                return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
-
-            srt_path = base.with_suffix(".srt")
-            with open(srt_path, "w", encoding="utf-8") as f:
-                for i, s in enumerate(segs, start=1):
-                    f.write(f"{i}\n{fmt_ts_srt(s.start)} --> {fmt_ts_srt(s.end)}\n{s.text.strip()}\n\n")
-
-            # VTT format function
-            def fmt_ts_vtt(t):
-                h = int(t // 3600)
-                m = int((t % 3600) // 60)
-                s = int(t % 60)
-                ms = int((t - int(t)) * 1000)
-                return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
-
-            vtt_path = base.with_suffix(".vtt")
-            with open(vtt_path, "w", encoding="utf-8") as f:
-                f.write("WEBVTT\n\n")
-                for s in segs:
-                    f.write(f"{fmt_ts_vtt(s.start)} --> {fmt_ts_vtt(s.end)}\n{s.text.strip()}\n\n")
-
-            print(f"✓ Saved transcriptions: {txt_path.name}, {srt_path.name}, {vtt_path.name}")
+            write_transcripts(base, input_path.name, segs)
+            try:
+                segment_cache.store(key, segs)
+            except OSError as e:
+                print(f"[WARNING] Could not cache segments of {input_path.name}: {e}")
             return True
 
         finally:
             bar.close()
-            # Clean up temporary audio file
-            if audio_path.exists() and audio_path.parent == CACHE_DIR:
-                try:
-                    audio_path.unlink()
-                except Exception:
-                    pass
 
     except Exception as e:
         print(f"✗ Error transcribing {input_path.name}: {e}")
@@ -221,19 +396,122 @@ def transcribe_video(model: WhisperModel, video_path, output_dir):
 
 
 # ------ Watcher voor real-time processing ------
-class VideoHandler(FileSystemEventHandler):
-    def __init__(self, model):
+class WatchScheduler:
+    """
+    Watch mode jobs: file events are debounced per path, stability is checked on the scheduler
+    thread (never on the observer thread), every path is queued once, and at most WATCH_WORKERS
+    files are transcribed at a time. While all workers are busy, new files wait in `pending`.
+    """
+
+    def __init__(self, model: "WhisperModel", output_dir, workers=WATCH_WORKERS, debounce=WATCH_DEBOUNCE):
         self.model = model
+        self.output_dir = output_dir
+        self.debounce = debounce
+        self.lock = threading.Lock()
+        self.pending = {}  # path -> (time of the last event or size change, last seen size/mtime)
+        self.active = set()  # queued or being transcribed
+        self.done = set()
+        self.work = queue.Queue(maxsize=workers)
+        self.stopping = threading.Event()
+        self.threads = [threading.Thread(target=self.run_checker, name="watch-scheduler", daemon=True)]
+        self.threads += [
+            threading.Thread(target=self.run_worker, name=f"watch-worker-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
 
-    def on_created(self, event):
-        if event.is_directory:
-            return
-        path = Path(event.src_path)
-        if path.suffix.lower() not in VIDEO_EXTS:
+    def notify(self, path):
+        """Called from the observer thread for created/modified/moved files; only records the event"""
+        path = Path(path).resolve()
+        if path.suffix.lower() not in MEDIA_EXTS:
             return
-        if is_file_stable(path):
-            output_dir = os.environ.get('TRANSCRIBER_OUTPUT_DIR', 'transcriptions')
-            threading.Thread(target=transcribe_video, args=(self.model, path, output_dir), daemon=True).start()
+        with self.lock:
+            if path in self.active or path in self.done:
+                return
+            self.pending[path] = (time.monotonic(), None)
+
+    def reconcile(self, input_dir):
+        """Queue the files that were already there (or arrived while not watching) and have no transcripts"""
+        backlog = [
+            path for path in get_video_files(input_dir)
+            if not has_transcripts(Path(self.output_dir) / path.stem)
+        ]
+        if backlog:
+            print(f"[INFO] {len(backlog)} file(s) without transcripts found, queued for transcription")
+        for path in backlog:
+            self.notify(path)
+
+    def file_state(self, path):
+        try:
+            stat = path.stat()
+            return stat.st_size, stat.st_mtime
+        except OSError:
+            return None
+
+    def run_checker(self):
+        """Move paths that stopped changing from `pending` to the (bounded) work queue"""
+        while not self.stopping.wait(0.5):
+            now = time.monotonic()
+            ready = []
+            with self.lock:
+                for path, (last_change, last_state) in list(self.pending.items()):
+                    if now - last_change < self.debounce:
+                        continue
+                    state = self.file_state(path)
+                    if state is None:
+                        del self.pending[path]  # deleted or moved away
+                    elif state == last_state and state[0] > 0:
+                        ready.append(path)
+                    else:
+                        self.pending[path] = (now, state)
+
+            for path in sorted(ready):
+                # Active before it is queued: a worker may finish (and discard it) before put() returns
+                with self.lock:
+                    self.pending.pop(path, None)
+                    self.active.add(path)
+                # Blocks while all workers are busy; events for other files keep collecting in `pending`
+                while not self.stopping.is_set():
+                    try:
+                        self.work.put(path, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                else:
+                    with self.lock:
+                        self.active.discard(path)
+
+    def run_worker(self):
+        while not self.stopping.is_set():
+            try:
+                path = self.work.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            success = transcribe_video(self.model, path, self.output_dir)
+            with self.lock:
+                self.active.discard(path)
+                if success:
+                    self.done.add(path)
+
+    def stop(self):
+        self.stopping.set()
+
+
+class VideoHandler(FileSystemEventHandler):
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.scheduler.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.scheduler.notify(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.scheduler.notify(event.dest_path)
 
 
 def run_batch_mode(model):
@@ -257,7 +535,7 @@ def run_batch_mode(model):
 
     if not video_files:
         print(f"No video files found in '{input_dir}'")
-        print(f"Supported formats: {', '.join(sorted(VIDEO_EXTS))}")
+        print(f"Supported formats: {', '.join(sorted(MEDIA_EXTS))}")
         return
 
     print(f"\nFound {len(video_files)} video file(s):")
@@ -276,16 +554,12 @@ def run_batch_mode(model):
     print(f"\nStarting transcription of {len(video_files)} video(s)...")
     print("This may take several minutes per video...")
 
-    successful = 0
-    failed = 0
     start_time = time.time()
 
-    for i, video_file in enumerate(video_files, 1):
-        print(f"\n[{i}/{len(video_files)}] Processing...")
-        if transcribe_video(model, video_file, output_dir):
-            successful += 1
-        else:
-            failed += 1
+    if worker_count() > 1:
+        successful, failed = transcribe_sharded(video_files, output_dir, worker_count())
+    else:
+        successful, failed = transcribe_in_order(model, video_files, output_dir)
 
     # Summary
     elapsed_time = time.time() - start_time
@@ -297,17 +571,163 @@ def run_batch_mode(model):
     print(f"Output directory: {output_dir}")
 
 
+def transcribe_in_order(model: "WhisperModel", video_files, output_dir):
+    """Batch mode with one model: returns (successful, failed)"""
+    successful = 0
+    failed = 0
+
+    # Audio extraction and ffprobe of the next files run in the background while the
+    # model transcribes the current one; at most PREFETCH_DEPTH files are prepared ahead
+    prefetch = ThreadPoolExecutor(max_workers=PREFETCH_DEPTH, thread_name_prefix="prefetch")
+    prepared = {}  # index -> future of prefetch_audio()
+
+    def schedule(index):
+        if index < len(video_files) and index not in prepared:
+            prepared[index] = prefetch.submit(prefetch_audio, video_files[index], output_dir)
+
+    try:
+        for i, video_file in enumerate(video_files, 1):
+            for index in range(i - 1, i + PREFETCH_DEPTH):
+                schedule(index)
+            print(f"\n[{i}/{len(video_files)}] Processing...")
+            if transcribe_video(model, video_file, output_dir, prepared=prepared.pop(i - 1, None)):
+                successful += 1
+            else:
+                failed += 1
+    finally:
+        prefetch.shutdown(wait=True, cancel_futures=True)
+    return successful, failed
+
+
+def transcribe_sharded(video_files, output_dir, workers):
+    """
+    Batch mode with several worker processes pulling from one shared queue, so a worker that
+    finishes early simply takes the next file. Returns the aggregated (successful, failed).
+    """
+    cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Starting {workers} worker processes ({cpu_threads} CPU threads each)...")
+
+    # spawn: every worker starts clean and loads its own model
+    context = multiprocessing.get_context("spawn")
+    work_queue = context.Queue()
+    result_queue = context.Queue()
+    for video_file in video_files:
+        work_queue.put(str(video_file))
+    for _ in range(workers):
+        work_queue.put(None)
+
+    processes = [
+        context.Process(
+            target=run_shard_worker,
+            args=(index, work_queue, result_queue, output_dir, cpu_threads),
+            name=f"transcriber-{index}"
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    results = {}
+    try:
+        while len(results) < len(video_files):
+            try:
+                path, success = result_queue.get(timeout=1)
+                results[path] = success
+            except queue.Empty:
+                # Workers that could not load the model leave their files to the others;
+                # once all workers are gone, whatever is left failed
+                if not any(process.is_alive() for process in processes) and result_queue.empty():
+                    break
+    except KeyboardInterrupt:
+        print("\nStopping workers...")
+        for process in processes:
+            process.terminate()
+    for process in processes:
+        process.join()
+
+    successful = sum(1 for success in results.values() if success)
+    return successful, len(video_files) - successful
+
+
+def run_shard_worker(index, work_queue, result_queue, output_dir, cpu_threads):
+    """Entry point of one --workers process: load a model with its share of the cores, then take files until None"""
+    global PROG_FIXED_POS
+    PROG_FIXED_POS = index  # one progress bar line per worker
+    try:
+        try:
+            model = load_model(cpu_threads)
+        except Exception as e:
+            print(f"✗ Worker {index}: error loading model: {e}")
+            return
+        while True:
+            path = work_queue.get()
+            if path is None:
+                break
+            result_queue.put((path, transcribe_video(model, path, output_dir)))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_queue_worker(job_queue, input_dir=None, output_dir=None):
+    """
+    Transcription stage of main.py --mode both (runs in its own process): load the model once,
+    transcribe what is already in the input folder, then every path put on job_queue until None
+    """
+    input_dir = input_dir or os.environ.get('TRANSCRIBER_INPUT_DIR', 'downloads')
+    output_dir = output_dir or os.environ.get('TRANSCRIBER_OUTPUT_DIR', 'transcriptions')
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    print("[TRANSCRIBER] Loading Whisper model...")
+    try:
+        model = load_model()
+    except Exception as e:
+        print(f"✗ Error loading model: {e}")
+        return
+
+    done = set()
+    successful = 0
+    failed = 0
+
+    def process(path):
+        nonlocal successful, failed
+        path = Path(path)
+        if path.resolve() in done:
+            return
+        done.add(path.resolve())
+        if transcribe_video(model, path, output_dir):
+            successful += 1
+        else:
+            failed += 1
+
+    # Videos downloaded earlier; transcribe_video skips the ones that already have transcripts
+    for video_file in get_video_files(input_dir):
+        process(video_file)
+
+    print("[TRANSCRIBER] Waiting for downloads...")
+    while True:
+        path = job_queue.get()
+        if path is None:
+            break
+        process(path)
+
+    print(f"[TRANSCRIBER] Finished: {successful} transcribed, {failed} failed")
+
+
 def run_watch_mode(model):
     """Watch downloads folder for new video files"""
     input_dir = os.environ.get('TRANSCRIBER_INPUT_DIR', 'downloads')
+    output_dir = os.environ.get('TRANSCRIBER_OUTPUT_DIR', 'transcriptions')
 
     print("Video Transcriber - Watch Mode")
     print("=" * 40)
-    print(f"[READY] Watching for video files in: {Path(input_dir).resolve()}")
 
+    scheduler = WatchScheduler(model, output_dir)
     observer = Observer()
-    observer.schedule(VideoHandler(model), str(input_dir), recursive=False)
+    observer.schedule(VideoHandler(scheduler), str(input_dir), recursive=False)
     observer.start()
+    # After the observer started, so files arriving in between are not missed (duplicates are ignored)
+    scheduler.reconcile(input_dir)
+    print(f"[READY] Watching for video files in: {Path(input_dir).resolve()}")
 
     try:
         while True:
@@ -315,6 +735,7 @@ def run_watch_mode(model):
     except KeyboardInterrupt:
         print("\n[INFO] Stopping file watcher...")
         observer.stop()
+        scheduler.stop()
     observer.join()
 
 
@@ -329,18 +750,15 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+    if worker_count() > 1:
+        # --workers: batch mode, every worker process loads its own model
+        run_batch_mode(None)
+        return
+
     # Initialize Whisper model
     print("Loading Enhanced Whisper AI model...")
     try:
-        device = "cuda" if USE_GPU else "cpu"
-        model = WhisperModel(MODEL_SIZE, device=device, compute_type=COMPUTE_TYPE)
-
-        try:
-            d = getattr(model, "device", device)
-        except Exception:
-            d = device
-        print(f"✓ Model loaded successfully")
-        print(f"[DEBUG] Model device: {d} | compute_type: {COMPUTE_TYPE}")
+        model = load_model()
     except Exception as e:
         print(f"✗ Error loading model: {e}")
         print("Falling back to basic mode...")
@@ -0,0 +1,299 @@
+"""
+Transcription Daemon
+Keeps the Whisper model loaded and transcribes jobs submitted over a local HTTP API,
+so the model is loaded once per machine instead of once per run
+
+API (JSON, 127.0.0.1 only):
+  GET    /health                 daemon and queue status
+  POST   /jobs                   submit {"path": ..., "output_dir": ...}
+  GET    /jobs                   all jobs
+  GET    /jobs/<id>              status of one job
+  DELETE /jobs/<id>              cancel (queued jobs are dropped, a running job stops between segments)
+  GET    /jobs/<id>/result       transcript text and output files of a finished job
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# ----- Config -----
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8737
+DAEMON_URL = os.environ.get("TRANSCRIBER_DAEMON_URL", f"http://{DAEMON_HOST}:{DAEMON_PORT}")
+MAX_FINISHED_JOBS = 500  # finished jobs kept for status/result queries
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+FINAL_STATES = (STATE_DONE, STATE_FAILED, STATE_CANCELLED)
+
+
+class TranscriptionDaemon:
+    """Job table plus one worker thread that owns the model"""
+
+    def __init__(self, model, output_dir):
+        self.model = model
+        self.output_dir = output_dir
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.ids = itertools.count(1)
+        self.worker = threading.Thread(target=self.run_worker, name="transcribe", daemon=True)
+        self.worker.start()
+
+    def submit(self, path, output_dir=None):
+        path = Path(path)
+        if not path.is_file():
+            raise ValueError(f"File not found: {path}")
+        job = {
+            'id': str(next(self.ids)),
+            'path': str(path.resolve()),
+            'output_dir': str(Path(output_dir or self.output_dir).resolve()),
+            'state': STATE_QUEUED,
+            'progress': 0.0,
+            'error': None,
+            'cancel_requested': False,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None
+        }
+        with self.lock:
+            self.jobs[job['id']] = job
+            self.forget_old_jobs()
+        self.queue.put(job['id'])
+        print(f"[DAEMON] Job {job['id']} queued: {path.name}")
+        return self.public(job)
+
+    def forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job['state'] in FINAL_STATES]
+        for job in sorted(finished, key=lambda j: j['finished_at'])[:-MAX_FINISHED_JOBS or None]:
+            del self.jobs[job['id']]
+
+    def status(self, job_id=None):
+        with self.lock:
+            if job_id is None:
+                return [self.public(job) for job in self.jobs.values()]
+            job = self.jobs.get(job_id)
+            return self.public(job) if job else None
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            if job['state'] == STATE_QUEUED:
+                job['state'] = STATE_CANCELLED
+                job['finished_at'] = time.time()
+            elif job['state'] == STATE_RUNNING:
+                job['cancel_requested'] = True
+            return self.public(job)
+
+    def result(self, job_id):
+        """Transcript of a finished job; None if unknown, the job (without text) if not done"""
+        job = self.status(job_id)
+        if not job or job['state'] != STATE_DONE:
+            return job
+        base = Path(job['output_dir']) / Path(job['path']).stem
+        files = {ext: str(base.with_suffix('.' + ext)) for ext in ('txt', 'srt', 'vtt')}
+        with open(files['txt'], 'r', encoding='utf-8') as f:
+            job['text'] = f.read()
+        job['files'] = files
+        return job
+
+    def public(self, job):
+        return {key: value for key, value in job.items() if key != 'cancel_requested'}
+
+    def run_worker(self):
+        from transcriber import transcribe_video
+
+        while True:
+            job_id = self.queue.get()
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if not job or job['state'] != STATE_QUEUED:
+                    continue
+                job['state'] = STATE_RUNNING
+                job['started_at'] = time.time()
+
+            def on_progress(done, total):
+                if total:
+                    job['progress'] = min(100.0, done / total * 100.0)
+
+            try:
+                success = transcribe_video(
+                    self.model, job['path'], job['output_dir'],
+                    cancel_check=lambda: job['cancel_requested'],
+                    progress_callback=on_progress
+                )
+                error = None if success else "Transcription failed"
+            except Exception as e:
+                success, error = False, str(e)
+
+            with self.lock:
+                if job['cancel_requested']:
+                    job['state'] = STATE_CANCELLED
+                elif success:
+                    job['state'] = STATE_DONE
+                    job['progress'] = 100.0
+                else:
+                    job['state'] = STATE_FAILED
+                    job['error'] = error
+                job['finished_at'] = time.time()
+            print(f"[DAEMON] Job {job_id} {job['state']}: {Path(job['path']).name}")
+
+    def queued_count(self):
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if job['state'] in (STATE_QUEUED, STATE_RUNNING))
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    daemon = None  # set by serve()
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        job_id = parts[1] if len(parts) > 1 and parts[0] == 'jobs' else None
+        return parts, job_id
+
+    def do_GET(self):
+        parts, job_id = self.route()
+        if parts == ['health']:
+            from transcriber import MODEL_SIZE
+            self.send_json(200, {'status': 'ok', 'model': MODEL_SIZE, 'pending': self.daemon.queued_count()})
+        elif parts == ['jobs']:
+            self.send_json(200, self.daemon.status())
+        elif job_id and len(parts) == 2:
+            job = self.daemon.status(job_id)
+            self.send_json(200, job) if job else self.send_json(404, {'error': 'unknown job'})
+        elif job_id and parts[2:] == ['result']:
+            try:
+                job = self.daemon.result(job_id)
+            except OSError as e:
+                self.send_json(500, {'error': str(e)})
+                return
+            if not job:
+                self.send_json(404, {'error': 'unknown job'})
+            elif job['state'] != STATE_DONE:
+                self.send_json(409, job)
+            else:
+                self.send_json(200, job)
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        parts, _ = self.route()
+        if parts != ['jobs']:
+            self.send_json(404, {'error': 'not found'})
+            return
+        # A web page can only send this content type after a CORS preflight, which is never answered,
+        # so other sites open in the browser cannot submit jobs for local files
+        if self.headers.get_content_type() != 'application/json':
+            self.send_json(415, {'error': 'Content-Type must be application/json'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            data = json.loads(self.rfile.read(length) or b'{}')
+            self.send_json(201, self.daemon.submit(data['path'], data.get('output_dir')))
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {'error': str(e)})
+
+    def do_DELETE(self):
+        parts, job_id = self.route()
+        job = self.daemon.cancel(job_id) if job_id and len(parts) == 2 else None
+        self.send_json(200, job) if job else self.send_json(404, {'error': 'unknown job'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(output_dir=None, host=DAEMON_HOST, port=DAEMON_PORT):
+    """Load the model once and serve the job API until Ctrl+C"""
+    from transcriber import CACHE_DIR, load_model
+
+    output_dir = output_dir or os.environ.get('TRANSCRIBER_OUTPUT_DIR', 'transcriptions')
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    print("Loading Whisper model (kept in memory while the daemon runs)...")
+    DaemonRequestHandler.daemon = TranscriptionDaemon(load_model(), output_dir)
+
+    server = ThreadingHTTPServer((host, port), DaemonRequestHandler)
+    print(f"[DAEMON] Transcription daemon listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[DAEMON] Stopping...")
+    finally:
+        server.server_close()
+
+
+class TranscriptionClient:
+    """Thin client for the daemon API (standard library only)"""
+
+    def __init__(self, base_url=DAEMON_URL, timeout=5):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, data=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            payload = json.loads(e.read() or b'{}')
+            if e.code == 409:
+                return payload
+            raise RuntimeError(payload.get('error') or f"HTTP {e.code}") from None
+
+    def is_running(self):
+        try:
+            return self.request('GET', '/health').get('status') == 'ok'
+        except (OSError, ValueError, RuntimeError):
+            return False
+
+    def submit(self, path, output_dir=None):
+        data = {'path': os.path.abspath(path)}
+        if output_dir:
+            data['output_dir'] = os.path.abspath(output_dir)
+        return self.request('POST', '/jobs', data)
+
+    def status(self, job_id):
+        return self.request('GET', f'/jobs/{job_id}')
+
+    def cancel(self, job_id):
+        return self.request('DELETE', f'/jobs/{job_id}')
+
+    def result(self, job_id):
+        return self.request('GET', f'/jobs/{job_id}/result')
+
+    def wait(self, job_ids, poll_interval=1.0):
+        """Block until every job is finished; prints each job once when it ends. Returns the final jobs."""
+        remaining = list(job_ids)
+        finished = {}
+        while remaining:
+            for job_id in list(remaining):
+                job = self.status(job_id)
+                if job['state'] in FINAL_STATES:
+                    remaining.remove(job_id)
+                    finished[job_id] = job
+                    print(f"[{job['state'].upper()}] {Path(job['path']).name}"
+                          + (f" ({job['error']})" if job.get('error') else ""))
+            if remaining:
+                time.sleep(poll_interval)
+        return [finished[job_id] for job_id in job_ids]
@@ -5,22 +5,75 @@ import os
 import re
 import threading
 import glob
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import http.cookiejar
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import download_scheduler
+import hls_fetcher
+import job_store
+import startup_profile
+
+# ----- Config -----
+MAX_CONCURRENT_DOWNLOADS = 3  # number of queue items downloaded at the same time
+DOWNLOAD_ENGINE = "yt-dlp"  # "yt-dlp" (subprocess), "yt-dlp-api" (in-process YoutubeDL) or "native" (built-in HLS fetcher)
+SEGMENT_CONCURRENCY = hls_fetcher.SEGMENT_CONCURRENCY  # segments per video for the native engine
+PROGRESS_REFRESH_HZ = 4  # panel progress updates (and stop checks) per second while downloading
+NETWORK_DRAIN_INTERVAL = 1.0  # seconds between reads of the Chrome performance log
+PANEL_EVENTS_JS = "return window.hlsDrainEvents ? window.hlsDrainEvents() : [];"
+DOWNLOAD_MODE = "video"  # "video" or "audio" (audio rendition / lowest variant, for transcription only)
+RESUME_DOWNLOADS = True  # keep partial files + checkpoint so a later run continues where it stopped
+DOWNLOAD_RETRIES = 2  # extra attempts for a failed download (resumes from the partial file when possible)
+DOWNLOAD_RETRY_DELAY = 5.0  # base of the jittered exponential backoff between attempts (seconds)
+KALTURA_ORIGIN = "https://kaltura-kaf.edu.kuleuven.cloud"
+CHROME_PROFILE_DIR = "chrome-profile"  # persistent Chrome user-data dir (keeps the portal login); None = fresh profile
+DRIVER_CACHE_FILE = os.path.join("downloads", ".chromedriver.json")  # resolved ChromeDriver path of the last run
 
 
 class FixedModernHLSDownloader:
-    def __init__(self):
+    def __init__(self, max_concurrent_downloads=MAX_CONCURRENT_DOWNLOADS,
+                 download_engine=DOWNLOAD_ENGINE, segment_concurrency=SEGMENT_CONCURRENCY,
+                 resume_downloads=RESUME_DOWNLOADS, download_mode=DOWNLOAD_MODE,
+                 job_db_path=job_store.JOB_DB_PATH, bandwidth_limit=download_scheduler.BANDWIDTH_LIMIT,
+                 per_host_limit=download_scheduler.PER_HOST_LIMIT, queue_policy=download_scheduler.QUEUE_POLICY,
+                 adaptive_concurrency=download_scheduler.ADAPTIVE_CONCURRENCY, stream_transcriber=None,
+                 on_download_complete=None, chrome_profile_dir=CHROME_PROFILE_DIR, attach_address=None):
         self.driver = None
         self.cookies = {}
         self.authenticated = False
         self.download_queue = []
-        self.current_url = ""
-        self.panel_injected = False
-        self.monitor_thread = None
+        self.chrome_profile_dir = chrome_profile_dir
+        # host:port of a Chrome started with --remote-debugging-port; None = launch our own
+        self.attach_address = attach_address
+        # HLS requests seen since the last "Stop Recording", keyed by URL (prefiltered, so it stays small).
+        # Drained from the main-loop ticks: the WebDriver is only used from the main thread
+        self.captured_hls = {}
+        self.last_network_drain = 0.0
+        # Panel events drained from the browser but not handled yet (main thread only)
+        self.pending_events = deque()
         self.running = True
-        self.current_download_process = None
-        self.current_download_filename = None
+        self.max_concurrent_downloads = max(1, int(max_concurrent_downloads))
+        self.download_engine = download_engine
+        self.segment_concurrency = max(1, int(segment_concurrency))
+        self.resume_downloads = resume_downloads
+        self.audio_only = download_mode == "audio"
+        # Transcribe while downloading (stream_transcriber.StreamTranscriber); None = plain downloads
+        self.stream_transcriber = stream_transcriber
+        # Called from the main thread with the path of every finished download (e.g. a transcription queue)
+        self.on_download_complete = on_download_complete
+        # Durable queue/job state; survives browser crashes and restarts
+        self.job_store = job_store.JobStore(job_db_path)
+        # Every running download has its own job state (process, progress, stop flag)
+        self.active_jobs = {}
+        self.jobs_lock = threading.Lock()
+        # Idle in-process YoutubeDL instances (engine "yt-dlp-api"), reused across the queue
+        self.ytdlp_instances = []
+        self.ytdlp_all_instances = []
+        # Bandwidth cap, per-host limits, queue order and adaptive concurrency for all downloads
+        self.scheduler = download_scheduler.DownloadScheduler(
+            self.max_concurrent_downloads, bandwidth_limit, per_host_limit, queue_policy, adaptive_concurrency
+        )
         self.download_stats = {
             'start_time': None,
             'downloaded_bytes': 0,
@@ -34,18 +87,75 @@ class FixedModernHLSDownloader:
 
     def setup_browser(self):
         """Setup Chrome browser with network logging enabled"""
+        # Selenium is only needed in browser mode (not for headless batches)
+        with startup_profile.step("import selenium"):
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+            from selenium.webdriver.chrome.service import Service
+
         chrome_options = Options()
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        chrome_options.add_argument("--enable-logging")
-        chrome_options.add_argument("--log-level=0")
+        if self.attach_address:
+            # Reuse a running Chrome (and its logged-in session); launch options do not apply
+            chrome_options.debugger_address = self.attach_address
+        else:
+            chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+            chrome_options.add_experimental_option('useAutomationExtension', False)
+            chrome_options.add_argument("--enable-logging")
+            chrome_options.add_argument("--log-level=0")
+            if self.chrome_profile_dir:
+                # Cookies and SSO login survive between runs
+                os.makedirs(self.chrome_profile_dir, exist_ok=True)
+                chrome_options.add_argument(f"--user-data-dir={os.path.abspath(self.chrome_profile_dir)}")
         chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
-
-        self.driver = webdriver.Chrome(options=chrome_options)
+        # Only network events are needed to find the HLS manifests
+        chrome_options.add_experimental_option('perfLoggingPrefs', {
+            'enableNetwork': True,
+            'enablePage': False
+        })
+
+        with startup_profile.step("attach to Chrome" if self.attach_address else "start Chrome"):
+            self.driver = self.start_chrome(webdriver, Service, chrome_options)
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
         self.driver.execute_cdp_cmd('Network.enable', {})
 
+    def start_chrome(self, webdriver, Service, chrome_options):
+        """
+        Start the WebDriver session with the ChromeDriver binary of the last run, so
+        Selenium Manager does not have to resolve (or download) it again
+        """
+        cached_path = None
+        try:
+            with open(DRIVER_CACHE_FILE, 'r', encoding='utf-8') as f:
+                cached_path = json.load(f).get('path')
+        except (OSError, ValueError):
+            pass
+
+        if cached_path and os.path.exists(cached_path):
+            try:
+                return webdriver.Chrome(service=Service(executable_path=cached_path), options=chrome_options)
+            except Exception as e:
+                # e.g. Chrome was updated and needs a newer driver
+                print(f"Cached ChromeDriver could not start Chrome ({e.__class__.__name__}), resolving a new one...")
+
+        try:
+            driver = webdriver.Chrome(options=chrome_options)
+        except Exception:
+            if self.chrome_profile_dir and not self.attach_address:
+                print(f"Could not start Chrome. Is another Chrome using '{self.chrome_profile_dir}'? "
+                      f"Close it, or attach to it with --attach-chrome.")
+            raise
+
+        driver_path = getattr(driver.service, 'path', None)
+        if driver_path and driver_path != cached_path:
+            try:
+                os.makedirs(os.path.dirname(DRIVER_CACHE_FILE) or '.', exist_ok=True)
+                with open(DRIVER_CACHE_FILE, 'w', encoding='utf-8') as f:
+                    json.dump({'path': driver_path}, f)
+            except OSError:
+                pass
+        return driver
+
     def inject_welcome_info(self):
         """Show welcome information on first load"""
         welcome_js = """
@@ -100,7 +210,7 @@ class FixedModernHLSDownloader:
                         <div style="margin-bottom: 10px;">• Add multiple videos to queue before downloading</div>
                         <div>• All controls are in the browser - no terminal needed!</div>
                     </div>
-                    <button onclick="document.getElementById('hls-welcome-info').remove();" style="
+                    <button onclick="document.getElementById('hls-welcome-info').remove(); window.hlsInjectPanel && window.hlsInjectPanel();" style="
                         background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%);
                         border: none;
                         color: white;
@@ -137,14 +247,9 @@ class FixedModernHLSDownloader:
         except:
             pass
 
-    def inject_comprehensive_panel(self):
-        """Inject a modern comprehensive control panel"""
-        try:
-            current_url = self.driver.current_url
-            if not current_url or 'about:blank' in current_url:
-                return False
-
-            panel_js = """
+    def panel_install_js(self):
+        """JS that defines window.hlsInjectPanel(); calling it builds the control panel"""
+        panel_js = """
             // Remove existing panel if it exists
             const existingPanel = document.getElementById('hls-comprehensive-panel');
             if (existingPanel) {
@@ -377,6 +482,18 @@ class FixedModernHLSDownloader:
                                     box-shadow: 0 4px 15px rgba(244, 67, 54, 0.3);
                                 " disabled>Clear All</button>
                             </div>
+                            <button id="export-queue" style="
+                                background: rgba(255,255,255,0.15);
+                                border: 1px solid rgba(255,255,255,0.2);
+                                color: white;
+                                padding: 8px 12px;
+                                border-radius: 6px;
+                                cursor: pointer;
+                                font-size: 11px;
+                                width: 100%;
+                                margin-top: 10px;
+                                transition: all 0.3s ease;
+                            " disabled>Export for headless download</button>
                         </div>
 
                         <!-- Download Progress -->
@@ -532,10 +649,28 @@ class FixedModernHLSDownloader:
                     downloading: false,
                     minimized: false,
                     completedDownloads: new Set(),
+                    itemProgress: {},
                     removeFromQueue: null,
-                    stopDownload: false
+                    events: []
                 };
             }
+            if (!window.hlsDownloaderState.itemProgress) {
+                window.hlsDownloaderState.itemProgress = {};
+            }
+            if (!window.hlsDownloaderState.events) {
+                window.hlsDownloaderState.events = [];
+            }
+
+            // Panel actions are queued as events; Python drains them all in one call
+            function pushPanelEvent(type, payload) {
+                window.hlsDownloaderState.events.push(Object.assign({type: type}, payload || {}));
+            }
+
+            window.hlsDrainEvents = function() {
+                const events = window.hlsDownloaderState.events;
+                window.hlsDownloaderState.events = [];
+                return events;
+            };
 
             // Global functions
             window.restorePanel = function() {
@@ -548,7 +683,8 @@ class FixedModernHLSDownloader:
             window.removeQueueItem = function(index) {
                 // Remove item directly from queue
                 if (window.hlsDownloaderState.queue && index >= 0 && index < window.hlsDownloaderState.queue.length) {
-                    window.hlsDownloaderState.queue.splice(index, 1);
+                    const removed = window.hlsDownloaderState.queue.splice(index, 1)[0];
+                    pushPanelEvent('unqueued', {source: removed});
                     updateQueueDisplay();
                     updatePanelStatus('Item removed from queue.');
                 }
@@ -566,16 +702,21 @@ class FixedModernHLSDownloader:
                 window.hlsDownloaderState.recording = false;
                 updatePanelStatus('Processing captured data...');
                 updateRecordingButtons(false);
-                window.hlsDownloaderState.recordingStopped = true;
+                pushPanelEvent('recordingStopped');
             });
 
             document.getElementById('add-to-queue').addEventListener('click', () => {
                 const filename = document.getElementById('filename-input').value.trim();
                 const source = window.hlsDownloaderState.selectedSource;
                 if (source && filename) {
+                    if (window.hlsDownloaderState.queue.some(queued => sameSource(queued, source))) {
+                        updatePanelStatus('This video is already in the queue.');
+                        return;
+                    }
                     source.filename = filename;
                     source.id = Date.now();
                     window.hlsDownloaderState.queue.push(source);
+                    pushPanelEvent('queued', {source: source});
                     updateQueueDisplay();
                     document.getElementById('filename-input').value = '';
                     document.getElementById('sources-section').style.display = 'none';
@@ -591,7 +732,7 @@ class FixedModernHLSDownloader:
                 if (source && filename) {
                     source.filename = filename;
                     source.id = Date.now();
-                    window.hlsDownloaderState.downloadNow = source;
+                    pushPanelEvent('downloadNow', {source: source});
                     document.getElementById('filename-input').value = '';
                     document.getElementById('sources-section').style.display = 'none';
                     updatePanelStatus('Starting download...');
@@ -602,7 +743,7 @@ class FixedModernHLSDownloader:
 
             document.getElementById('process-queue').addEventListener('click', () => {
                 if (window.hlsDownloaderState.queue.length > 0) {
-                    window.hlsDownloaderState.processQueue = true;
+                    pushPanelEvent('processQueue');
                     updatePanelStatus('Processing download queue...');
                 }
             });
@@ -610,12 +751,22 @@ class FixedModernHLSDownloader:
             document.getElementById('clear-queue').addEventListener('click', () => {
                 window.hlsDownloaderState.queue = [];
                 window.hlsDownloaderState.completedDownloads.clear();
+                pushPanelEvent('queueCleared');
                 updateQueueDisplay();
                 updatePanelStatus('Queue cleared.');
             });
 
+            document.getElementById('export-queue').addEventListener('click', () => {
+                const completed = window.hlsDownloaderState.completedDownloads;
+                const remaining = window.hlsDownloaderState.queue.filter(item => !completed.has(item.id));
+                if (remaining.length > 0) {
+                    pushPanelEvent('exportQueue', {queue: remaining});
+                    updatePanelStatus('Exporting queue...');
+                }
+            });
+
             document.getElementById('stop-download').addEventListener('click', () => {
-                window.hlsDownloaderState.stopDownload = true;
+                pushPanelEvent('stopDownload');
                 updatePanelStatus('Stopping download...');
             });
 
@@ -627,7 +778,8 @@ class FixedModernHLSDownloader:
             });
 
             document.getElementById('close-panel').addEventListener('click', () => {
-                window.hlsDownloaderState.closedPanel = true;
+                window.hlsDownloaderState.closed = true;
+                pushPanelEvent('closedPanel');
                 document.getElementById('hls-comprehensive-panel').style.animation = 'panelSlideIn 0.3s ease-out reverse';
                 setTimeout(() => {
                     document.getElementById('hls-comprehensive-panel').remove();
@@ -635,6 +787,10 @@ class FixedModernHLSDownloader:
             });
 
             // Helper functions
+            function sameSource(a, b) {
+                return (a.source_id && a.source_id === b.source_id) || a.url === b.url;
+            }
+
             function updatePanelStatus(message) {
                 document.getElementById('current-status').textContent = message;
             }
@@ -651,6 +807,7 @@ class FixedModernHLSDownloader:
                 const queueCount = document.getElementById('queue-count');
                 const queue = window.hlsDownloaderState.queue;
                 const completed = window.hlsDownloaderState.completedDownloads;
+                const itemProgress = window.hlsDownloaderState.itemProgress || {};
 
                 queueCount.textContent = queue.length;
 
@@ -658,10 +815,15 @@ class FixedModernHLSDownloader:
                     queueList.innerHTML = '<div style="opacity: 0.7; padding: 12px; text-align: center;">Queue is empty</div>';
                     document.getElementById('process-queue').disabled = true;
                     document.getElementById('clear-queue').disabled = true;
+                    document.getElementById('export-queue').disabled = true;
                 } else {
                     queueList.innerHTML = queue.map((item, i) => {
                         const isCompleted = completed.has(item.id);
-                        const statusIcon = isCompleted ? '✅' : '⏳';
+                        const progress = itemProgress[item.id];
+                        const isFailed = !isCompleted && progress && progress.status === 'failed';
+                        const statusIcon = isCompleted ? '✅' : (isFailed ? '❌' : '⏳');
+                        const progressText = (!isCompleted && progress && progress.status === 'downloading')
+                            ? ` - ${progress.percent.toFixed(1)}%` : '';
                         const itemClass = isCompleted ? 'queue-item-completed' : '';
 
                         return `<div class="${itemClass}" style="
@@ -675,12 +837,13 @@ class FixedModernHLSDownloader:
                             align-items: center;
                             transition: all 0.3s ease;
                         ">
-                            <span style="font-weight: 500;">${statusIcon} ${i+1}. ${item.filename} (${item.url_type})</span>
+                            <span style="font-weight: 500;">${statusIcon} ${i+1}. ${item.filename} (${item.url_type})${progressText}</span>
                             <button class="queue-item-remove" onclick="removeQueueItem(${i})">×</button>
                         </div>`;
                     }).join('');
                     document.getElementById('process-queue').disabled = false;
                     document.getElementById('clear-queue').disabled = false;
+                    document.getElementById('export-queue').disabled = false;
                 }
             }
 
@@ -744,7 +907,36 @@ class FixedModernHLSDownloader:
                 }
             };
 
+            window.hlsUpdateQueueProgress = function(items) {
+                // Per-item progress from the parallel download workers
+                const active = [];
+                items.forEach(item => {
+                    window.hlsDownloaderState.itemProgress[item.id] = item;
+                    if (item.status === 'downloading') {
+                        active.push(item);
+                    }
+                });
+                updateQueueDisplay();
+
+                if (active.length > 0) {
+                    const overall = active.reduce((sum, item) => sum + item.percent, 0) / active.length;
+                    const names = active.map(item => item.filename).join(', ');
+                    const stats = active.length === 1 ? active[0].stats : `${active.length} active downloads`;
+                    window.hlsUpdateProgress(overall, names, stats);
+                }
+            };
+
             window.hlsUpdateStatus = updatePanelStatus;
+            window.hlsRestoreQueue = function(items) {
+                // Unfinished jobs from the Python job store (previous page or previous session)
+                const queue = window.hlsDownloaderState.queue;
+                items.forEach(item => {
+                    if (!queue.some(queued => sameSource(queued, item))) {
+                        queue.push(item);
+                    }
+                });
+                updateQueueDisplay();
+            };
             window.hlsMarkCompleted = function(itemId) {
                 window.hlsDownloaderState.completedDownloads.add(itemId);
                 updateQueueDisplay();
@@ -754,58 +946,58 @@ class FixedModernHLSDownloader:
             updateQueueDisplay();
             updateRecordingButtons(false);
             updatePanelStatus('Ready! Navigate to a video page and click Start.');
+            pushPanelEvent('panelReady');
+
+            // Re-inject when the page's own scripts wipe the panel (SPA re-render), unless closed
+            if (!window.hlsPanelObserver) {
+                window.hlsPanelObserver = new MutationObserver(() => {
+                    if (!document.getElementById('hls-comprehensive-panel') &&
+                            !window.hlsDownloaderState.closed && document.body) {
+                        window.hlsInjectPanel();
+                    }
+                });
+                window.hlsPanelObserver.observe(document.documentElement, {childList: true});
+                window.hlsPanelObserver.observe(document.body, {childList: true});
+            }
 
             console.log('Modern HLS Downloader panel injected');
             return true;
             """
+        return (
+            "window.hlsInjectPanel = function() {\n"
+            "    if (window.top !== window || !document.body) { return false; }\n"
+            + panel_js +
+            "\n};\n"
+        )
 
-            result = self.driver.execute_script(panel_js)
-            self.panel_injected = True
-            self.current_url = current_url
-            return True
-
-        except Exception as e:
-            print(f"Failed to inject panel: {e}")
-            self.panel_injected = False
-            return False
-
-    def start_page_monitor(self):
-        """Monitor page changes and re-inject panel as needed"""
-
-        def monitor():
-            while self.running:
-                try:
-                    if self.driver:
-                        current_url = self.driver.current_url
-
-                        # Check if URL changed or panel is missing
-                        if (current_url != self.current_url or
-                                not self.check_panel_exists()):
-
-                            if current_url and 'about:blank' not in current_url:
-                                time.sleep(1)  # Wait for page to load
-                                if self.inject_comprehensive_panel():
-                                    print(f"Panel re-injected on: {current_url[:50]}...")
-
-                        time.sleep(2)  # Check every 2 seconds
-                    else:
-                        break
-
-                except Exception as e:
-                    time.sleep(2)
-
-        self.monitor_thread = threading.Thread(target=monitor, daemon=True)
-        self.monitor_thread.start()
+    def register_panel_script(self):
+        """Let Chrome add the panel to every new document itself (no navigation polling)"""
+        source = self.panel_install_js() + """
+        if (window.top === window) {
+            if (document.readyState === 'loading') {
+                document.addEventListener('DOMContentLoaded', () => window.hlsInjectPanel());
+            } else {
+                window.hlsInjectPanel();
+            }
+        }
+        """
+        self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': source})
 
-    def check_panel_exists(self):
-        """Check if the panel still exists on the page"""
+    def drain_network_log_if_due(self):
+        """Main-loop tick: drain the performance log regularly so stopping a recording only handles the tail"""
+        if not self.driver or time.time() - self.last_network_drain < NETWORK_DRAIN_INTERVAL:
+            return
         try:
-            exists = self.driver.execute_script(
-                "return document.getElementById('hls-comprehensive-panel') !== null;"
-            )
-            return exists
-        except:
-            return False
+            self.drain_network_log()
+        except Exception:
+            pass
+
+    def drain_network_log(self):
+        """Read the new performance log entries and keep only the HLS requests"""
+        self.last_network_drain = time.time()
+        logs = self.driver.get_log('performance')
+        for source in self.extract_hls_from_logs(logs):
+            self.captured_hls[source['url']] = source
 
     def authenticate_at_portal(self, portal_url):
         """Opens the university portal and sets up the system"""
@@ -813,35 +1005,30 @@ class FixedModernHLSDownloader:
         self.setup_browser()
         self.driver.get(portal_url)
 
-        # Show welcome info first
-        time.sleep(2)
+        # Every following document gets the panel from Chrome itself
+        self.register_panel_script()
+
+        # driver.get already waited for the load event; only wait if a redirect is still loading
+        deadline = time.time() + 2
+        while time.time() < deadline:
+            try:
+                if self.driver.execute_script("return document.readyState") == "complete":
+                    break
+            except Exception:
+                pass
+            time.sleep(0.1)
+
+        # Show welcome info first; dismissing it builds the panel on this page
+        try:
+            self.driver.execute_script(self.panel_install_js())
+        except Exception as e:
+            print(f"Failed to prepare panel: {e}")
         self.inject_welcome_info()
 
         print("\nPlease log in to your university portal...")
         print("The control panel will appear after you dismiss the welcome message.")
         print("All controls are in the browser - no more terminal commands!")
 
-        # Wait for welcome to be dismissed, then inject panel
-        def wait_and_inject():
-            while True:
-                try:
-                    welcome_exists = self.driver.execute_script(
-                        "return document.getElementById('hls-welcome-info') !== null;"
-                    )
-                    if not welcome_exists:
-                        time.sleep(1)
-                        self.inject_comprehensive_panel()
-                        break
-                    time.sleep(1)
-                except:
-                    time.sleep(1)
-
-        inject_thread = threading.Thread(target=wait_and_inject, daemon=True)
-        inject_thread.start()
-
-        # Start monitoring for page changes
-        self.start_page_monitor()
-
         cookies = self.driver.get_cookies()
         self.cookies = {cookie['name']: cookie['value'] for cookie in cookies}
         self.authenticated = True
@@ -849,6 +1036,57 @@ class FixedModernHLSDownloader:
         print("System ready! Use the browser panel to control everything.")
         return self.driver.current_url
 
+    def poll_panel_events(self, script=""):
+        """Fetch and clear every queued panel event in a single WebDriver round trip"""
+        events = self.driver.execute_script(script + PANEL_EVENTS_JS) or []
+        self.pending_events.extend(events)
+
+    def restore_queue(self):
+        """Put unfinished jobs from the job store back into the panel queue"""
+        sources = self.job_store.unfinished_sources()
+        if sources:
+            print(f"Restoring {len(sources)} unfinished download(s) into the panel queue")
+            self.driver.execute_script(f"window.hlsRestoreQueue({json.dumps(sources)});")
+
+    def take_stop_request(self):
+        """Remove pending stop events; True if the user asked to stop"""
+        stop = any(event.get('type') == 'stopDownload' for event in self.pending_events)
+        if stop:
+            self.pending_events = deque(
+                event for event in self.pending_events if event.get('type') != 'stopDownload'
+            )
+        return stop
+
+    def handle_panel_event(self, event):
+        """Dispatch a single panel event; returns None for bookkeeping events that need no reply"""
+        event_type = event.get('type')
+        if event_type == 'panelReady':
+            self.restore_queue()
+            return None
+        if event_type == 'queued' and event.get('source'):
+            self.job_store.add_job(self.tag_source(event['source']))
+            return None
+        if event_type == 'unqueued' and event.get('source'):
+            self.job_store.remove_job(self.tag_source(event['source']))
+            return None
+        if event_type == 'queueCleared':
+            self.job_store.clear_unfinished()
+            return None
+        if event_type == 'recordingStopped':
+            return self.process_captured_sources()
+        if event_type == 'downloadNow' and event.get('source'):
+            return self.download_single_video(event['source'])
+        if event_type == 'processQueue':
+            return self.process_download_queue()
+        if event_type == 'stopDownload':
+            return self.stop_current_download()
+        if event_type == 'exportQueue':
+            return self.export_job_file(event.get('queue') or [])
+        if event_type == 'closedPanel':
+            print("Panel closed by user. Exiting...")
+            return False
+        return True
+
     def wait_for_user_action(self):
         """Wait for user actions through the panel"""
         print("\nAll controls are now in the browser panel!")
@@ -857,49 +1095,15 @@ class FixedModernHLSDownloader:
 
         while self.running:
             try:
-                # Check for recording stopped
-                recording_stopped = self.driver.execute_script(
-                    "return window.hlsDownloaderState?.recordingStopped || false;"
-                )
-                if recording_stopped:
-                    # Clear the flag
-                    self.driver.execute_script("window.hlsDownloaderState.recordingStopped = false;")
-                    return self.process_captured_sources()
-
-                # Check for download now request
-                download_now = self.driver.execute_script(
-                    "return window.hlsDownloaderState?.downloadNow || null;"
-                )
-                if download_now:
-                    # Clear the flag
-                    self.driver.execute_script("window.hlsDownloaderState.downloadNow = null;")
-                    return self.download_single_video(download_now)
-
-                # Check for process queue request
-                process_queue = self.driver.execute_script(
-                    "return window.hlsDownloaderState?.processQueue || false;"
-                )
-                if process_queue:
-                    # Clear the flag
-                    self.driver.execute_script("window.hlsDownloaderState.processQueue = false;")
-                    return self.process_download_queue()
-
-                # Check for stop download request
-                stop_download = self.driver.execute_script(
-                    "return window.hlsDownloaderState?.stopDownload || false;"
-                )
-                if stop_download:
-                    # Clear the flag
-                    self.driver.execute_script("window.hlsDownloaderState.stopDownload = false;")
-                    return self.stop_current_download()
-
-                # Check if panel was closed
-                panel_closed = self.driver.execute_script(
-                    "return window.hlsDownloaderState?.closedPanel || false;"
-                )
-                if panel_closed:
-                    print("Panel closed by user. Exiting...")
-                    return False
+                self.drain_network_log_if_due()
+                if not self.pending_events:
+                    self.poll_panel_events()
+
+                if self.pending_events:
+                    result = self.handle_panel_event(self.pending_events.popleft())
+                    if result is not None:
+                        return result
+                    continue
 
                 time.sleep(0.5)
 
@@ -909,36 +1113,52 @@ class FixedModernHLSDownloader:
         return False
 
     def stop_current_download(self):
-        """Stop the current download process and clean up partial files"""
-        if self.current_download_process:
-            try:
-                self.current_download_process.terminate()
-                print("Download stopped by user")
+        """Stop all running downloads (partial files are kept for resume unless disabled)"""
+        with self.jobs_lock:
+            jobs = list(self.active_jobs.values())
 
-                # Clean up partial files
-                if self.current_download_filename:
-                    self.cleanup_partial_files(self.current_download_filename)
+        for job in jobs:
+            self.stop_download_job(job)
 
-                self.driver.execute_script("window.hlsUpdateStatus('Download stopped and cleaned up.');")
+        if jobs:
+            print("Download stopped by user")
+            message = 'Download stopped. Start it again to resume.' if self.resume_downloads \
+                else 'Download stopped and cleaned up.'
+            try:
+                self.driver.execute_script(f"window.hlsUpdateStatus({json.dumps(message)});")
                 self.driver.execute_script("window.hlsUpdateProgress(-1, '', '');")
-                self.current_download_process = None
-                self.current_download_filename = None
             except Exception as e:
                 print(f"Error stopping download: {e}")
         return True
 
-    def cleanup_partial_files(self, filename):
+    def stop_download_job(self, job):
+        """Ask a single download worker to stop; the worker handles its own partial files"""
+        job['stop_requested'] = True
+        process = job.get('process')
+        if process:
+            try:
+                process.terminate()
+            except Exception as e:
+                print(f"Error stopping {job['filename']}: {e}")
+
+    def discard_partial_files(self, filename, downloads_dir="downloads"):
+        """Handle partial files of a stopped/failed download: keep them for resume, or delete them"""
+        if self.resume_downloads:
+            print(f"Keeping partial files of {filename} to resume later")
+            return
+        self.cleanup_partial_files(filename, downloads_dir)
+
+    def cleanup_partial_files(self, filename, downloads_dir="downloads"):
         """Clean up partial download files (.part, .frag, etc.)"""
         try:
-            # Create download directory path
-            downloads_dir = "downloads"
-
             # Patterns for partial files
             partial_patterns = [
                 f"{filename}.*.part",
                 f"{filename}.*.frag*",
                 f"{filename}.f*.ts",
-                f"{filename}.*.tmp"
+                f"{filename}.*.tmp",
+                f"{filename}.*.ytdl",
+                f"{filename}.*.resume.json"
             ]
 
             for pattern in partial_patterns:
@@ -971,17 +1191,27 @@ class FixedModernHLSDownloader:
         # Update panel status
         self.driver.execute_script("window.hlsUpdateStatus('Processing captured data...');")
 
-        # Get network logs
+        # Drain the last network log entries; everything before was drained by the main-loop ticks
         try:
-            logs = self.driver.get_log('performance')
+            self.drain_network_log()
         except Exception as e:
             print(f"Network capture failed: {e}")
             self.driver.execute_script("window.hlsUpdateStatus('Network capture failed. Try again.');")
             return True
 
+        hls_sources = list(self.captured_hls.values())
+        self.captured_hls.clear()
+
         # Process HLS sources
-        hls_sources = self.extract_hls_from_logs(logs)
         unique_sources = self.analyze_hls_sources(hls_sources)
+        self.probe_hls_variants(unique_sources)
+
+        # Lectures that were downloaded before resolve to the existing file
+        for source in unique_sources:
+            existing = self.job_store.finished_output(self.tag_source(source))
+            if existing:
+                source['existing_file'] = existing
+                source['url_type'] += f" - already downloaded as {os.path.basename(existing)}"
 
         if unique_sources:
             print(f"Found {len(unique_sources)} HLS streams")
@@ -1004,8 +1234,13 @@ class FixedModernHLSDownloader:
         hls_sources = []
 
         for log in logs:
+            # Cheap substring check first: only a handful of the messages mention a manifest
+            raw = log.get('message', '')
+            if 'm3u8' not in raw and 'M3U8' not in raw:
+                continue
+
             try:
-                message = json.loads(log['message'])
+                message = json.loads(raw)
 
                 if message['message']['method'] in ['Network.responseReceived', 'Network.requestWillBeSent']:
                     if 'params' in message['message']:
@@ -1035,53 +1270,101 @@ class FixedModernHLSDownloader:
         return hls_sources
 
     def analyze_hls_sources(self, sources):
-        """Analyze HLS sources and remove duplicates"""
+        """Analyze HLS sources and collapse URLs of the same lecture (tokens/flavors differ)"""
         if not sources:
             return []
 
-        # Remove duplicates
-        unique_sources = []
-        seen_urls = set()
-
+        # One entry per canonical source id; the latest capture wins (freshest token),
+        # but a master manifest is never replaced by a single flavor
+        by_id = {}
         for source in sources:
             url = source['url']
-            if url not in seen_urls:
-                seen_urls.add(url)
-
-                # Determine type
-                if 'serveflavor' in url.lower():
-                    url_type = "Direct"
-                else:
-                    url_type = "Manifest"
-
-                unique_sources.append({
-                    'url': url,
-                    'headers': source['headers'],
-                    'url_type': url_type,
-                    'filename': ''
-                })
 
+            # Determine type
+            if 'serveflavor' in url.lower():
+                url_type = "Direct"
+            else:
+                url_type = "Manifest"
+
+            source_id = job_store.canonical_source_id(url)
+            existing = by_id.get(source_id)
+            if existing and existing['url_type'] == "Manifest" and url_type == "Direct":
+                continue
+
+            by_id[source_id] = {
+                'url': url,
+                'headers': source['headers'],
+                'url_type': url_type,
+                'source_id': source_id,
+                'filename': ''
+            }
+
+        unique_sources = list(by_id.values())
         return unique_sources
 
+    def probe_hls_variants(self, sources):
+        """Fetch captured master playlists in parallel and attach their variants to the sources"""
+        manifests = [source for source in sources if source['url_type'] == "Manifest"]
+        if not manifests:
+            return
+
+        # Cookies may have changed since login (SSO), refresh them before direct requests
+        try:
+            self.cookies = {cookie['name']: cookie['value'] for cookie in self.driver.get_cookies()}
+        except Exception:
+            pass
+        referer = self.driver.current_url
+
+        def probe(source):
+            try:
+                return hls_fetcher.probe_master(source['url'], self.build_download_headers(source, referer))
+            except Exception as e:
+                print(f"Could not read manifest variants: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(4, len(manifests))) as pool:
+            masters = list(pool.map(probe, manifests))
+
+        for source, master in zip(manifests, masters):
+            if not master:
+                continue
+            source['variants'] = master['variants']
+            source['audio'] = master['audio']
+            description = hls_fetcher.describe_master(master)
+            if description:
+                source['url_type'] = f"Manifest ({description})"
+
     def download_single_video(self, source):
         """Download a single video immediately"""
+        existing = self.job_store.finished_output(self.tag_source(source))
+        if existing:
+            print(f"Already downloaded: {existing}")
+            self.driver.execute_script(
+                f"window.hlsUpdateStatus({json.dumps('Already downloaded: ' + os.path.basename(existing))});"
+            )
+            return True
+
         print(f"Starting download: {source['filename']}")
 
         self.driver.execute_script(
             f"window.hlsUpdateStatus('Downloading {source['filename']}...');"
         )
 
-        success = self.download_video(source)
+        jobs = self.run_download_jobs([source], mark_completed=False)
+        success = bool(jobs) and jobs[0]['status'] == 'done'
 
         if success:
             self.driver.execute_script("window.hlsUpdateStatus('Download completed! Ready for next video.');")
+        elif jobs and jobs[0]['status'] == 'stopped':
+            self.driver.execute_script("window.hlsUpdateStatus('Download stopped by user.');")
+            self.driver.execute_script("window.hlsUpdateProgress(-1, '', '');")
         else:
             self.driver.execute_script("window.hlsUpdateStatus('Download failed. Try again.');")
 
         return True
 
     def process_download_queue(self):
-        """Process all items in the download queue"""
+        """Process all items in the download queue with a pool of download workers"""
         # Get queue from browser
         queue = self.driver.execute_script("return window.hlsDownloaderState.queue || [];")
 
@@ -1089,76 +1372,525 @@ class FixedModernHLSDownloader:
             self.driver.execute_script("window.hlsUpdateStatus('Queue is empty.');")
             return True
 
-        print(f"Processing {len(queue)} items in queue...")
-        self.driver.execute_script(f"window.hlsUpdateStatus('Processing {len(queue)} downloads...');")
+        # Skip sources the job store already has a finished file for
+        skipped = [source for source in queue if self.job_store.finished_output(self.tag_source(source))]
+        for source in skipped:
+            print(f"Already downloaded: {source['filename']}")
+            if source.get('id') is not None:
+                self.driver.execute_script(f"window.hlsMarkCompleted({json.dumps(source['id'])});")
+        queue = [source for source in queue if source not in skipped]
+
+        if not queue:
+            self.driver.execute_script("window.hlsUpdateStatus('All videos in the queue are already downloaded.');")
+            return True
+
+        workers = min(self.max_concurrent_downloads, len(queue))
+        print(f"Processing {len(queue)} items in queue ({workers} parallel)...")
+        self.driver.execute_script(
+            f"window.hlsUpdateStatus('Processing {len(queue)} downloads ({workers} at a time)...');"
+        )
 
-        for i, source in enumerate(queue, 1):
-            print(f"Downloading {i}/{len(queue)}: {source['filename']}")
+        jobs = self.run_download_jobs(queue)
 
+        done = sum(1 for job in jobs if job['status'] == 'done')
+        failed = sum(1 for job in jobs if job['status'] == 'failed')
+        stopped = sum(1 for job in jobs if job['status'] == 'stopped')
+
+        # Don't clear queue automatically - let user see completed status
+        if stopped:
             self.driver.execute_script(
-                f"window.hlsUpdateStatus('Downloading {i}/{len(queue)}: {source['filename']}');"
+                f"window.hlsUpdateStatus('Downloads stopped. {done} completed, {stopped} stopped.');"
             )
+            self.driver.execute_script("window.hlsUpdateProgress(-1, '', '');")
+        else:
+            self.driver.execute_script(
+                f"window.hlsUpdateStatus('All downloads completed! {done} succeeded, {failed} failed.');"
+            )
+        print(f"Queue processing completed! ({done} done, {failed} failed, {stopped} stopped)")
 
-            success = self.download_video(source)
+        return True
 
-            if success:
-                # Mark as completed in the queue
-                self.driver.execute_script(f"window.hlsMarkCompleted({source['id']});")
-            else:
-                print(f"Failed to download: {source['filename']}")
-                self.driver.execute_script(
-                    f"window.hlsUpdateStatus('Failed: {source['filename']}. Continuing...');"
-                )
-
-            # Check if user wants to stop
-            stop_requested = self.driver.execute_script(
-                "return window.hlsDownloaderState?.stopDownload || false;"
-            )
-            if stop_requested:
-                self.driver.execute_script("window.hlsDownloaderState.stopDownload = false;")
-                break
+    def tag_source(self, source):
+        """Add the canonical identity and download mode the job store indexes on"""
+        if not source.get('source_id'):
+            source['source_id'] = job_store.canonical_source_id(source['url'])
+        if self.stream_transcriber and not self.stream_transcriber.save_video:
+            # Transcribed while downloading without keeping a file: not a download of the video
+            source['mode'] = "stream"
+        else:
+            source['mode'] = "audio" if self.audio_only else "video"
+        return source
+
+    def create_download_job(self, source, output_dir="downloads"):
+        """Create the state a single download worker owns"""
+        self.tag_source(source)
+        return {
+            'id': source.get('id'),
+            'store_id': self.job_store.add_job(source),
+            'source': source,
+            'filename': source['filename'],
+            'output_dir': output_dir,
+            # Headless jobs have no browser page to fall back to
+            'referer': source.get('referer') or (self.driver.current_url if self.driver else KALTURA_ORIGIN),
+            'process': None,
+            'output_path': None,
+            'error': None,
+            'stop_requested': False,
+            'status': 'pending',
+            'percent': 0.0,
+            'stats': '',
+            'downloaded_bytes': 0,
+            'attempts': 0,
+            'retryable': True,
+            'fetch_stats': {}
+        }
 
-        # Don't clear queue automatically - let user see completed status
-        self.driver.execute_script("window.hlsUpdateStatus('All downloads completed! Queue shows completion status.');")
-        print("Queue processing completed!")
+    def run_download_jobs(self, sources, output_dir="downloads", mark_completed=True):
+        """Download sources in parallel; the WebDriver is only used from this (main) thread"""
+        self.make_filenames_unique(sources)
+        sources = self.scheduler.order(sources, self.estimate_source_size)
+        jobs = [self.create_download_job(source, output_dir) for source in sources]
+        if not jobs:
+            return jobs
+
+        workers = min(self.max_concurrent_downloads, len(jobs))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as pool:
+            # Jobs are submitted only when the scheduler admits them, in queue order
+            waiting = list(jobs)
+            futures = {}
 
+            try:
+                self.wait_for_download_jobs(jobs, futures, waiting, pool, mark_completed)
+            except BaseException:
+                # Ctrl-C or a dead browser: stop the workers so the pool can shut down
+                for job in jobs:
+                    self.stop_download_job(job)
+                raise
+
+        return jobs
+
+    def make_filenames_unique(self, sources):
+        """Parallel jobs with the same filename would write (and clean up) each other's files: rename to 'name (2)'"""
+        taken = set()
+        for source in sources:
+            name = source['filename']
+            number = 2
+            while name.lower() in taken:
+                name = f"{source['filename']} ({number})"
+                number += 1
+            if name != source['filename']:
+                print(f"Renamed duplicate filename {source['filename']} to {name}")
+                source['filename'] = name
+            taken.add(name.lower())
+
+    def estimate_source_size(self, source):
+        """Estimated download size in bytes for shortest-first ordering (None if unknown)"""
+        if '.m3u8' not in source['url'].lower() and not source.get('url_type', '').startswith("Manifest"):
+            return None
+        try:
+            referer = source.get('referer') or (self.driver.current_url if self.driver else '')
+            headers = self.build_download_headers(source, referer)
+            return hls_fetcher.estimate_stream_size(source['url'], headers, self.audio_only)
+        except Exception as e:
+            print(f"Could not estimate size of {source['filename']}: {e}")
+            return None
+
+    def start_scheduled_jobs(self, waiting, futures, pool):
+        """Submit waiting jobs the scheduler has room for (skipping hosts that are at their limit)"""
+        started = set()
+        for job in list(waiting):
+            if job['stop_requested']:
+                # Stopped before it ever started: it stays queued in the job store
+                waiting.remove(job)
+                job['status'] = 'stopped'
+                self.record_job_result(job)
+                continue
+            if not self.scheduler.can_start(job['source']):
+                continue
+            waiting.remove(job)
+            self.scheduler.job_started(job['source'])
+            future = pool.submit(self.run_scheduled_job, job)
+            futures[future] = job
+            started.add(future)
+        return started
+
+    def run_scheduled_job(self, job):
+        """Worker: download one job (retrying failed attempts) and hand its slot back to the scheduler"""
+        try:
+            for attempt in range(DOWNLOAD_RETRIES + 1):
+                if attempt and not self.wait_before_retry(job, attempt):
+                    break
+                success = self.download_video(job['source'], job['output_dir'], job)
+                if job['status'] != 'failed' or job['stop_requested'] or not job['retryable']:
+                    return success
+            return False
+        finally:
+            self.scheduler.job_finished(job['source'], job['status'] != 'failed')
+
+    def wait_before_retry(self, job, attempt):
+        """Back off before the next attempt of a failed job; False if the user stopped it meanwhile"""
+        delay = hls_fetcher.backoff_delay(attempt, base=DOWNLOAD_RETRY_DELAY, maximum=60.0)
+        print(f"Retrying {job['filename']} in {delay:.0f}s (attempt {attempt + 1}/{DOWNLOAD_RETRIES + 1}, "
+              f"error: {job['error']})")
+        job['stats'] = f"Retrying in {delay:.0f}s..."
+        deadline = time.time() + delay
+        while time.time() < deadline:
+            if job['stop_requested']:
+                job['status'] = 'stopped'
+                self.record_job_result(job)
+                return False
+            time.sleep(0.2)
+        return True
+
+    def wait_for_download_jobs(self, jobs, futures, waiting, pool, mark_completed):
+        """Main-thread loop: start admitted jobs, report progress, mark finished items and forward stop requests"""
+        last_reported = {}
+        pending = set()
+        while pending or waiting:
+            pending |= self.start_scheduled_jobs(waiting, futures, pool)
+            finished, pending = wait(pending, timeout=1.0 / PROGRESS_REFRESH_HZ)
+            self.scheduler.sample(sum(job['downloaded_bytes'] for job in jobs))
+
+            for future in finished:
+                job = futures[future]
+                if job['status'] == 'done':
+                    print(f"Finished: {job['filename']}")
+                    self.notify_download_complete(job)
+                    if self.driver and mark_completed and job['id'] is not None:
+                        self.driver.execute_script(f"window.hlsMarkCompleted({json.dumps(job['id'])});")
+                elif job['status'] == 'failed':
+                    print(f"Failed to download: {job['filename']} "
+                          f"({job['attempts']} attempt(s), last error: {job['error']})")
+                    if self.driver:
+                        self.driver.execute_script(
+                            f"window.hlsUpdateStatus({json.dumps('Failed: ' + job['filename'] + '. Continuing...')});"
+                        )
+
+            if not self.driver:
+                # Headless batch: progress goes to the console
+                self.print_download_progress(jobs, last_reported)
+                continue
+
+            # Progress update and event drain share one round trip per tick
+            self.report_download_progress(jobs, last_reported)
+            self.drain_network_log_if_due()
+
+            # Check if user wants to stop; other events wait until the downloads are done
+            if self.take_stop_request():
+                print("Stopping all downloads...")
+                for job in jobs:
+                    self.stop_download_job(job)
+
+    def notify_download_complete(self, job):
+        """Hand a finished file to the on_download_complete hook"""
+        if not self.on_download_complete:
+            return
+        output_path = job['output_path'] or self.find_output_file(job['filename'], job['output_dir'])
+        if output_path:
+            self.on_download_complete(output_path)
+
+    def report_download_progress(self, jobs, last_reported=None):
+        """Send changed job progress to the panel and collect panel events in a single call"""
+        items = []
+        for job in jobs:
+            if job['id'] is None:
+                continue
+            item = {
+                'id': job['id'],
+                'filename': job['filename'],
+                'percent': job['percent'],
+                'stats': job['stats'],
+                'status': job['status']
+            }
+            # Workers may have printed many progress lines since the last tick; only the latest counts
+            if last_reported is not None:
+                if last_reported.get(job['id']) == item:
+                    continue
+                last_reported[job['id']] = item
+            items.append(item)
+
+        script = ""
+        if items:
+            script = f"window.hlsUpdateQueueProgress && window.hlsUpdateQueueProgress({json.dumps(items)});"
+        try:
+            self.poll_panel_events(script)
+        except Exception:
+            pass
+
+    def print_download_progress(self, jobs, last_printed):
+        """Console progress for headless runs: one line per job every 10%"""
+        for job in jobs:
+            if job['status'] != 'downloading':
+                continue
+            step = int(job['percent'] // 10)
+            if last_printed.get(id(job), -1) < step:
+                last_printed[id(job)] = step
+                print(f"  [{job['percent']:5.1f}%] {job['filename']} {job['stats']}")
+
+    def export_job_file(self, queue, output_dir="downloads"):
+        """Write the queue plus session cookies to a job file for run_headless_batch"""
+        cookies = self.driver.get_cookies()
+        data = {
+            'version': 1,
+            'exported_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'referer': self.driver.current_url,
+            'cookies': cookies,
+            'jobs': [{
+                'url': source['url'],
+                'filename': source['filename'],
+                'headers': source.get('headers') or {},
+                'source_id': source.get('source_id') or job_store.canonical_source_id(source['url'])
+            } for source in queue]
+        }
+
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"jobs_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        # The file holds session cookies: readable by the owner only
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+        print(f"Exported {len(queue)} job(s) to {path}")
+        print("Run them without a browser: python main.py --mode headless --job-file " + path)
+        print("[WARNING] The job file contains your session cookies - keep it private.")
+        self.driver.execute_script(
+            f"window.hlsUpdateStatus({json.dumps('Exported ' + str(len(queue)) + ' job(s) to ' + path)});"
+        )
         return True
 
+    def run_headless_batch(self, job_file, output_dir="downloads"):
+        """Download every job of an exported job file without starting a browser"""
+        with open(job_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        self.cookies = {cookie['name']: cookie['value'] for cookie in data.get('cookies', [])}
+        self.authenticated = True
+
+        sources = []
+        for item in data.get('jobs', []):
+            source = dict(item)
+            source.setdefault('headers', {})
+            source['referer'] = item.get('referer') or data.get('referer', '')
+            if self.job_store.finished_output(self.tag_source(source)):
+                print(f"Already downloaded: {source['filename']}")
+                continue
+            sources.append(source)
+
+        if not sources:
+            print("Nothing to download.")
+            return True
+
+        workers = min(self.max_concurrent_downloads, len(sources))
+        print(f"Downloading {len(sources)} job(s) from {job_file} ({workers} parallel)...")
+        jobs = self.run_download_jobs(sources, output_dir)
+
+        done = sum(1 for job in jobs if job['status'] == 'done')
+        failed = [job for job in jobs if job['status'] == 'failed']
+        print(f"Headless batch completed! ({done} done, {len(failed)} failed)")
+        for job in failed:
+            print(f"  Failed: {job['filename']} ({job['attempts']} attempt(s), last error: {job['error']})")
+        return not failed
+
     def build_cookie_string(self):
         """Convert cookies dict to string format for yt-dlp"""
         return "; ".join([f"{name}={value}" for name, value in self.cookies.items()])
 
-    def download_video(self, source, output_dir="downloads"):
-        """Download video using yt-dlp with progress updates to panel"""
+    def build_download_headers(self, source, referer):
+        """HTTP headers for direct requests: captured cookies, referer and origin"""
+        headers = {
+            'Cookie': self.build_cookie_string(),
+            'Referer': referer,
+            'Origin': KALTURA_ORIGIN
+        }
+        # Reuse the browser's user agent when it was captured with the request
+        for name, value in (source.get('headers') or {}).items():
+            if name.lower() == 'user-agent':
+                headers['User-Agent'] = value
+        return headers
+
+    def download_video(self, source, output_dir="downloads", job=None):
+        """Download a video with the configured engine (runs in a worker thread)"""
+        if job is None:
+            job = self.create_download_job(source, output_dir)
+
         if not self.authenticated:
+            job['status'] = 'failed'
             return False
 
+        job['attempts'] += 1
+        job['error'] = None
+        job['retryable'] = True
+        job['fetch_stats'] = {'retries': 0, 'hedged': 0, 'hedge_wins': 0}
+        if job.get('store_id') is not None:
+            self.job_store.mark_running(job['store_id'])
+        try:
+            # Streaming transcription needs the segments, so it always uses the native engine
+            if self.download_engine == "native" or self.stream_transcriber:
+                try:
+                    return self.download_video_native(source, output_dir, job)
+                except hls_fetcher.HLSUnsupportedError as e:
+                    print(f"Native engine cannot handle {source['filename']} ({e}), using yt-dlp")
+
+            if self.download_engine == "yt-dlp-api":
+                success = self.download_video_ytdlp_api(source, output_dir, job)
+            else:
+                success = self.download_video_ytdlp(source, output_dir, job)
+            if success and self.stream_transcriber:
+                job['stats'] = 'Transcribing...'
+                output_path = job['output_path'] or self.find_output_file(source['filename'], output_dir)
+                if output_path:
+                    self.stream_transcriber.transcribe_file(output_path)
+            return success
+        finally:
+            self.record_job_result(job)
+
+    def record_job_result(self, job):
+        """Persist the outcome of a download in the job store"""
+        if job.get('store_id') is None:
+            return
+        stats = job.get('fetch_stats') or {}
+        if stats.get('retries') or stats.get('hedged'):
+            self.job_store.add_fetch_stats(job['store_id'], stats.get('retries', 0), stats.get('hedged', 0))
+            # Counted once per attempt, even if the result is recorded again (e.g. stopped during backoff)
+            job['fetch_stats'] = {}
+        if job['status'] == 'done':
+            output_path = job['output_path']
+            if not output_path and job['source'].get('mode') != "stream":
+                output_path = self.find_output_file(job['filename'], job['output_dir'])
+            byte_count = os.path.getsize(output_path) if output_path and os.path.exists(output_path) else 0
+            self.job_store.mark_done(job['store_id'], byte_count, output_path)
+        elif job['status'] == 'failed':
+            self.job_store.mark_failed(job['store_id'], job['error'])
+        else:
+            self.job_store.mark_pending(job['store_id'])
+
+    def find_output_file(self, filename, output_dir):
+        """Locate the finished file yt-dlp wrote for <filename>.<ext>"""
+        candidates = [
+            path for path in glob.glob(os.path.join(output_dir, glob.escape(filename) + ".*"))
+            if not path.endswith(('.part', '.ytdl', '.tmp', '.json')) and '.frag' not in path
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=os.path.getmtime)
+
+    def download_video_native(self, source, output_dir, job):
+        """
+        Download an HLS stream with the built-in segment-parallel fetcher.
+        In streaming mode the segments also go into an ffmpeg decode pipe that is
+        transcribed while downloading; the video itself is only kept if asked for.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        stream = None
+        save_file = self.stream_transcriber is None or self.stream_transcriber.save_video
+
+        def on_progress(percent, stats, downloaded_bytes):
+            job['percent'] = percent
+            job['stats'] = stats
+            job['downloaded_bytes'] = downloaded_bytes
+
+        job_key = id(job)
+        with self.jobs_lock:
+            self.active_jobs[job_key] = job
+
+        try:
+            if self.stream_transcriber:
+                try:
+                    stream = self.stream_transcriber.open(source['filename'])
+                except OSError as e:
+                    # Not a network error: another attempt will not start ffmpeg either
+                    raise hls_fetcher.HLSError(f"Could not start ffmpeg for streaming transcription: {e}") from e
+            job['status'] = 'downloading'
+            job['output_path'] = hls_fetcher.download_hls(
+                source['url'],
+                os.path.join(output_dir, source['filename']) if save_file else None,
+                headers=self.build_download_headers(source, job['referer']),
+                concurrency=self.segment_concurrency,
+                progress_callback=on_progress,
+                stop_check=lambda: job['stop_requested'],
+                # A resumed download would skip the segments the decoder has not seen
+                resume=self.resume_downloads and self.stream_transcriber is None,
+                audio_only=self.audio_only or not save_file,
+                limiter=self.scheduler,
+                stats=job['fetch_stats'],
+                segment_sink=stream.write if stream else None
+            )
+            if stream:
+                job['stats'] = 'Finishing transcription...'
+                # Kept apart from output_path: a transcript is never recorded as the downloaded file
+                job['transcript_path'] = str(stream.finish())
+            job['percent'] = 100.0
+            job['stats'] = 'Completed!'
+            job['status'] = 'done'
+            return True
+
+        except hls_fetcher.HLSUnsupportedError:
+            job['status'] = 'pending'
+            raise
+        except hls_fetcher.HLSStopped:
+            if save_file:
+                self.discard_partial_files(source['filename'], output_dir)
+            job['status'] = 'stopped'
+            return False
+        except Exception as e:
+            print(f"Error: {e}")
+            job['error'] = str(e)
+            # e.g. 403/404 on the manifest (expired session): another attempt will not help
+            job['retryable'] = hls_fetcher.is_retryable(e)
+            if save_file:
+                self.discard_partial_files(source['filename'], output_dir)
+            job['status'] = 'stopped' if job['stop_requested'] else 'failed'
+            return False
+        finally:
+            if stream and job['status'] != 'done':
+                stream.abort()
+            with self.jobs_lock:
+                self.active_jobs.pop(job_key, None)
+
+    def download_video_ytdlp(self, source, output_dir, job):
+        """Download video using yt-dlp, reporting progress into the job state"""
         # Create downloads directory
         os.makedirs(output_dir, exist_ok=True)
 
         cookie_string = self.build_cookie_string()
-        current_url = self.driver.current_url
 
         # Video goes directly to downloads folder
         video_output_pattern = os.path.join(output_dir, f"{source['filename']}.%(ext)s")
 
-        # Store current download filename for cleanup
-        self.current_download_filename = source['filename']
-
         cmd = [
             "yt-dlp",
             "--add-header", f"Cookie: {cookie_string}",
-            "--referer", current_url,
-            "--add-header", "Origin: https://kaltura-kaf.edu.kuleuven.cloud",
+            "--referer", job['referer'],
+            "--add-header", f"Origin: {KALTURA_ORIGIN}",
             "-o", video_output_pattern,
             "--no-write-info-json",  # Don't write JSON files
             "--no-write-thumbnail",  # Don't write thumbnail files
             "--newline",
-            source['url']
+            "--continue" if self.resume_downloads else "--no-continue",
+            # Jittered exponential backoff between yt-dlp's own request and fragment retries
+            "--retry-sleep", "http:exp=1:20",
+            "--retry-sleep", "fragment:exp=1:20",
         ]
+        if self.audio_only:
+            # Audio rendition if the manifest has one, otherwise the lowest-bitrate variant
+            cmd += ["-f", "bestaudio/worst"]
+        rate_limit = self.scheduler.ytdlp_rate_limit()
+        if rate_limit:
+            # yt-dlp runs out of process: each download gets its share of the global cap
+            cmd += ["--limit-rate", str(rate_limit)]
+        cmd.append(source['url'])
+
+        job_key = id(job)
+        with self.jobs_lock:
+            self.active_jobs[job_key] = job
 
         try:
-            self.current_download_process = subprocess.Popen(
+            if job['stop_requested']:
+                job['status'] = 'stopped'
+                return False
+
+            job['status'] = 'downloading'
+            job['process'] = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
@@ -1167,59 +1899,190 @@ class FixedModernHLSDownloader:
                 universal_newlines=True
             )
 
+            # This worker thread only reads and parses yt-dlp output so the pipe never backs up;
+            # the main thread publishes the latest progress at PROGRESS_REFRESH_HZ
             while True:
-                # Check if user wants to stop
-                stop_requested = self.driver.execute_script(
-                    "return window.hlsDownloaderState?.stopDownload || false;"
-                )
-                if stop_requested:
-                    self.current_download_process.terminate()
-                    self.driver.execute_script("window.hlsDownloaderState.stopDownload = false;")
-                    self.driver.execute_script("window.hlsUpdateStatus('Download stopped by user.');")
-                    self.driver.execute_script("window.hlsUpdateProgress(-1, '', '');")
-
-                    # Clean up partial files
-                    self.cleanup_partial_files(source['filename'])
-
-                    self.current_download_process = None
-                    self.current_download_filename = None
-                    return False
-
-                output = self.current_download_process.stdout.readline()
-                if output == '' and self.current_download_process.poll() is not None:
+                if job['stop_requested'] and job['process'].poll() is None:
+                    job['process'].terminate()
+
+                output = job['process'].stdout.readline()
+                if output == '' and job['process'].poll() is not None:
                     break
 
                 if output:
-                    output = output.strip()
-                    progress_info = self.parse_yt_dlp_progress(output)
+                    if "Retrying" in output:
+                        job['fetch_stats']['retries'] = job['fetch_stats'].get('retries', 0) + 1
+                    progress_info = self.parse_yt_dlp_progress(output.strip())
                     if progress_info:
-                        # Update panel progress
-                        self.driver.execute_script(
-                            f"window.hlsUpdateProgress({progress_info['percent']}, '{source['filename']}', '{progress_info['stats']}');"
-                        )
-
-            return_code = self.current_download_process.poll()
-            self.current_download_process = None
-            self.current_download_filename = None
+                        job['percent'] = progress_info['percent']
+                        job['stats'] = progress_info['stats']
+                        if progress_info['total_bytes']:
+                            job['downloaded_bytes'] = int(progress_info['total_bytes'] * progress_info['percent'] / 100)
+
+            return_code = job['process'].wait()
+            job['process'] = None
+
+            if job['stop_requested']:
+                # Stopped by user - keep or clean up partial files
+                self.discard_partial_files(source['filename'], output_dir)
+                job['status'] = 'stopped'
+                return False
 
             if return_code == 0:
-                self.driver.execute_script(
-                    f"window.hlsUpdateProgress(100, '{source['filename']}', 'Completed!');"
-                )
+                job['percent'] = 100.0
+                job['stats'] = 'Completed!'
+                job['status'] = 'done'
                 return True
             else:
-                # Clean up partial files on failure
-                self.cleanup_partial_files(source['filename'])
+                # Keep or clean up partial files on failure
+                job['error'] = f"yt-dlp exited with code {return_code}"
+                self.discard_partial_files(source['filename'], output_dir)
+                job['status'] = 'failed'
+                return False
+
+        except Exception as e:
+            print(f"Error: {e}")
+            job['error'] = str(e)
+            # Keep or clean up partial files on exception
+            self.discard_partial_files(source['filename'], output_dir)
+            job['process'] = None
+            job['status'] = 'failed'
+            return False
+        finally:
+            with self.jobs_lock:
+                self.active_jobs.pop(job_key, None)
+
+    def acquire_ytdlp(self):
+        """Take an idle YoutubeDL instance (with its HTTP connection pool) or create one"""
+        with self.jobs_lock:
+            if self.ytdlp_instances:
+                return self.ytdlp_instances.pop()
+
+        with startup_profile.step("import yt_dlp"):
+            import yt_dlp
+
+        # The progress hook reads the job of whichever download currently uses the instance
+        holder = {'job': None}
+
+        def progress_hook(status):
+            job = holder['job']
+            if job is None:
+                return
+            if job['stop_requested']:
+                # Cooperative cancellation: yt-dlp unwinds and closes its files
+                raise yt_dlp.utils.DownloadCancelled("Download stopped by user")
+            if status.get('status') == 'downloading':
+                self.apply_ytdlp_progress(job, status)
+
+        ydl = yt_dlp.YoutubeDL({
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'writeinfojson': False,
+            'writethumbnail': False,
+            'progress_hooks': [progress_hook],
+            # The format selector is built once in the constructor, so the mode is set here, not per download
+            'format': "bestaudio/worst" if self.audio_only else None,
+            # Same backoff as --retry-sleep exp=1:20 for the subprocess engine
+            'retry_sleep_functions': {
+                'http': lambda n: min(20, 2 ** n),
+                'fragment': lambda n: min(20, 2 ** n)
+            }
+        })
+        instance = (ydl, holder)
+        with self.jobs_lock:
+            self.ytdlp_all_instances.append(instance)
+        return instance
+
+    def release_ytdlp(self, instance):
+        instance[1]['job'] = None
+        with self.jobs_lock:
+            self.ytdlp_instances.append(instance)
+
+    def load_ytdlp_cookies(self, ydl, url):
+        """Put the session cookies in the instance's cookie jar, scoped to the host of the download"""
+        host = urlsplit(url).hostname or ''
+        for name, value in self.cookies.items():
+            ydl.cookiejar.set_cookie(http.cookiejar.Cookie(
+                0, name, value, None, False, host, True, False, '/', True,
+                False, None, True, None, None, {}
+            ))
+
+    def apply_ytdlp_progress(self, job, status):
+        """Structured progress from a yt-dlp progress hook into the job state"""
+        downloaded = status.get('downloaded_bytes') or 0
+        total = status.get('total_bytes') or status.get('total_bytes_estimate')
+        if total:
+            job['percent'] = min(100.0, downloaded / total * 100.0)
+        elif status.get('fragment_count'):
+            job['percent'] = (status.get('fragment_index') or 0) / status['fragment_count'] * 100.0
+        job['downloaded_bytes'] = downloaded
+
+        stats_parts = []
+        if status.get('speed'):
+            stats_parts.append(f"Speed: {status['speed'] / (1024 * 1024):.2f}MiB/s")
+        if status.get('eta') is not None:
+            stats_parts.append(f"ETA: {int(status['eta']) // 60:02d}:{int(status['eta']) % 60:02d}")
+        if total:
+            stats_parts.append(f"Size: {'~' if not status.get('total_bytes') else ''}{total / (1024 * 1024):.2f}MiB")
+        job['stats'] = " | ".join(stats_parts) if stats_parts else "Downloading..."
+
+    def download_video_ytdlp_api(self, source, output_dir, job):
+        """Download with an in-process YoutubeDL instance; progress arrives through progress_hooks"""
+        import yt_dlp
+
+        os.makedirs(output_dir, exist_ok=True)
+        job_key = id(job)
+        with self.jobs_lock:
+            self.active_jobs[job_key] = job
+
+        instance = None
+        try:
+            if job['stop_requested']:
+                job['status'] = 'stopped'
                 return False
 
+            instance = self.acquire_ytdlp()
+            ydl, holder = instance
+            holder['job'] = job
+            # Per-download settings on the reused instance (used by one download at a time)
+            headers = self.build_download_headers(source, job['referer'])
+            headers.pop('Cookie')
+            ydl.params['http_headers'].update(headers)
+            self.load_ytdlp_cookies(ydl, source['url'])
+            ydl.params['outtmpl'] = {'default': os.path.join(output_dir, f"{source['filename']}.%(ext)s")}
+            ydl.params['continuedl'] = self.resume_downloads
+            ydl.params['ratelimit'] = self.scheduler.ytdlp_rate_limit()
+
+            job['status'] = 'downloading'
+            info = ydl.extract_info(source['url'], download=True)
+
+            downloads = (info or {}).get('requested_downloads') or []
+            job['output_path'] = downloads[0].get('filepath') if downloads else None
+            job['percent'] = 100.0
+            job['stats'] = 'Completed!'
+            job['status'] = 'done'
+            return True
+
+        except yt_dlp.utils.DownloadCancelled:
+            self.discard_partial_files(source['filename'], output_dir)
+            job['status'] = 'stopped'
+            return False
         except Exception as e:
+            if job['stop_requested']:
+                self.discard_partial_files(source['filename'], output_dir)
+                job['status'] = 'stopped'
+                return False
             print(f"Error: {e}")
-            # Clean up partial files on exception
-            if self.current_download_filename:
-                self.cleanup_partial_files(self.current_download_filename)
-            self.current_download_process = None
-            self.current_download_filename = None
+            job['error'] = str(e)
+            self.discard_partial_files(source['filename'], output_dir)
+            job['status'] = 'failed'
             return False
+        finally:
+            if instance:
+                self.release_ytdlp(instance)
+            with self.jobs_lock:
+                self.active_jobs.pop(job_key, None)
 
     def parse_yt_dlp_progress(self, line):
         """Parse yt-dlp output for progress information"""
@@ -1251,12 +2114,16 @@ class FixedModernHLSDownloader:
                         except (ValueError, IndexError):
                             pass
 
-                        # Look for file size (after "of")
+                        # Look for file size (after "of", possibly "of ~ 100.00MiB" for estimates)
+                        total_bytes = None
                         try:
                             of_index = parts.index("of")
                             if of_index + 1 < len(parts):
                                 size = parts[of_index + 1]
+                                if size == "~" and of_index + 2 < len(parts):
+                                    size = parts[of_index + 2]
                                 stats_parts.append(f"Size: {size}")
+                                total_bytes = self.parse_size(size)
                         except (ValueError, IndexError):
                             pass
 
@@ -1264,27 +2131,44 @@ class FixedModernHLSDownloader:
 
                         return {
                             'percent': percent,
-                            'stats': stats
+                            'stats': stats,
+                            'total_bytes': total_bytes
                         }
             except:
                 pass
         return None
 
+    def parse_size(self, text):
+        """Convert a yt-dlp size like '~100.50MiB' to bytes (None if it cannot be parsed)"""
+        match = re.match(r'~?([\d.]+)([KMGT]i?B|B)', text)
+        if not match:
+            return None
+        factors = {'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+        return int(float(match.group(1)) * factors[match.group(2)[0]])
+
     def cleanup(self):
         """Close browser and cleanup"""
         self.running = False
-        if self.current_download_process:
+        with self.jobs_lock:
+            jobs = list(self.active_jobs.values())
+        for job in jobs:
             try:
-                self.current_download_process.terminate()
-                # Clean up any partial files
-                if self.current_download_filename:
-                    self.cleanup_partial_files(self.current_download_filename)
+                # Workers handle their own partial files once stopped
+                self.stop_download_job(job)
             except:
                 pass
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=2)
+        for ydl, _ in self.ytdlp_all_instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass
         if self.driver:
-            self.driver.quit()
+            if self.attach_address:
+                # Leave the user's own Chrome running; only stop our ChromeDriver
+                self.driver.service.stop()
+            else:
+                self.driver.quit()
+        self.job_store.close()
 
 
 def main():